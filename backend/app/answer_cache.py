@@ -0,0 +1,226 @@
+"""
+Cache of generated answers, stored in SQLite next to the terms database.
+
+Two tiers sit in front of the LLM call:
+  1. exact: normalised question + hash of the retrieved context
+  2. semantic: a cached question whose embedding is within a cosine
+     similarity threshold of the new question and that was answered from
+     the same retrieved context (so "...in Germany" is never answered with
+     the entry for "...in the USA")
+
+Entries expire after a TTL, the least recently used ones are evicted beyond
+a maximum size, and the whole cache is dropped when the rental terms corpus
+changes (tracked through the embedding index fingerprint).
+
+Configuration (environment variables):
+    SIXT_ANSWER_CACHE            1 (default) to enable, 0 to disable
+    SIXT_ANSWER_CACHE_TTL        seconds an answer stays valid (default 86400)
+    SIXT_ANSWER_CACHE_SIZE       maximum number of cached answers (default 1000)
+    SIXT_ANSWER_CACHE_THRESHOLD  cosine similarity for semantic hits (default 0.95)
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from .db import DB_PATH
+
+CACHE_ENABLED = os.getenv('SIXT_ANSWER_CACHE', '1') == '1'
+CACHE_TTL = float(os.getenv('SIXT_ANSWER_CACHE_TTL', '86400'))
+CACHE_SIZE = int(os.getenv('SIXT_ANSWER_CACHE_SIZE', '1000'))
+CACHE_THRESHOLD = float(os.getenv('SIXT_ANSWER_CACHE_THRESHOLD', '0.95'))
+
+_NON_WORD = re.compile(r'[^\w\s]')
+
+# Initial rows of the in-memory embedding matrix; it doubles when full
+MATRIX_CAPACITY = 64
+
+
+def cache_path_for(db_path: str = DB_PATH) -> str:
+    """The answer cache lives in its own file so writes don't touch the terms database"""
+    return os.path.join(os.path.dirname(db_path), "answer_cache.db")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace"""
+    return " ".join(_NON_WORD.sub(" ", question.lower()).split())
+
+
+def context_hash(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with an in-memory matrix of question embeddings"""
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL, max_entries: int = CACHE_SIZE,
+                 threshold: float = CACHE_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                key TEXT PRIMARY KEY,
+                question TEXT,
+                context_hash TEXT,
+                answer TEXT,
+                embedding BLOB,
+                created_at REAL,
+                last_used REAL
+            );
+            CREATE TABLE IF NOT EXISTS answer_cache_meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+        self._load_embeddings()
+
+    def _load_embeddings(self) -> None:
+        """Build the in-memory semantic tier from the stored embeddings"""
+        self._reset_embeddings()
+        for key, chash, blob in self._conn.execute(
+                "SELECT key, context_hash, embedding FROM answer_cache WHERE embedding IS NOT NULL"):
+            self._add_embedding(key, chash, np.frombuffer(blob, dtype=np.float32))
+
+    def _reset_embeddings(self) -> None:
+        # Row i of the matrix is the question embedding of _keys[i], answered from context _hashes[i]
+        self._keys: List[str] = []
+        self._hashes: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+
+    def _add_embedding(self, key: str, chash: str, vector: np.ndarray) -> None:
+        self._remove_embedding(key)
+        count = len(self._keys)
+        if self._matrix is None or count == len(self._matrix):
+            grown = np.empty((max(MATRIX_CAPACITY, 2 * count), len(vector)), dtype=np.float32)
+            if count:
+                grown[:count] = self._matrix[:count]
+            self._matrix = grown
+        self._matrix[count] = vector
+        self._rows[key] = count
+        self._keys.append(key)
+        self._hashes.append(chash)
+
+    def _remove_embedding(self, key: str) -> None:
+        """Drop a row by moving the last row into its place"""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self._keys) - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._keys[row], self._hashes[row] = self._keys[last], self._hashes[last]
+            self._rows[self._keys[row]] = row
+        self._keys.pop()
+        self._hashes.pop()
+
+    def _check_version(self, corpus_version: str) -> None:
+        """Drop every entry when the rental terms corpus has changed"""
+        row = self._conn.execute(
+            "SELECT value FROM answer_cache_meta WHERE name = 'corpus_version'").fetchone()
+        if row and row[0] == corpus_version:
+            return
+        if row:
+            print("♻️ Rental terms changed, clearing answer cache")
+        self._conn.execute("DELETE FROM answer_cache")
+        self._conn.execute("INSERT OR REPLACE INTO answer_cache_meta VALUES ('corpus_version', ?)",
+                           (corpus_version,))
+        self._conn.commit()
+        self._reset_embeddings()
+
+    def get(self, question: str, context: str, corpus_version: str,
+            query_embedding: Optional[np.ndarray] = None) -> Optional[Tuple[str, str]]:
+        """
+        Look up an answer. Returns (answer, tier) where tier is 'exact' or
+        'semantic', or None on a miss.
+        """
+        now = time.time()
+        chash = context_hash(context)
+        key = self._key(question, context)
+        with self._lock:
+            self._check_version(corpus_version)
+            row = self._conn.execute(
+                "SELECT key, answer, created_at FROM answer_cache WHERE key = ?", (key,)).fetchone()
+            tier = 'exact'
+            # Semantic hits only among questions answered from the same context
+            same_context = [i for i, h in enumerate(self._hashes) if h == chash]
+            if row is None and query_embedding is not None and same_context:
+                scores = self._matrix[same_context] @ np.asarray(query_embedding, dtype=np.float32)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    row = self._conn.execute(
+                        "SELECT key, answer, created_at FROM answer_cache WHERE key = ?",
+                        (self._keys[same_context[best]],)).fetchone()
+                    tier = 'semantic'
+            if row is None:
+                return None
+            if now - row[2] > self.ttl:
+                self._delete(row[0])
+                return None
+            self._conn.execute("UPDATE answer_cache SET last_used = ? WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+            return row[1], tier
+
+    def put(self, question: str, context: str, corpus_version: str, answer: str,
+            query_embedding: Optional[np.ndarray] = None) -> None:
+        """Store an answer and evict expired / least recently used entries"""
+        now = time.time()
+        chash = context_hash(context)
+        key = self._key(question, context)
+        vector = np.asarray(query_embedding, dtype=np.float32) if query_embedding is not None else None
+        with self._lock:
+            self._check_version(corpus_version)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, question, chash, answer, vector.tobytes() if vector is not None else None, now, now))
+            evicted = [k for (k,) in self._conn.execute("""
+                SELECT key FROM answer_cache WHERE created_at < ? OR key IN (
+                    SELECT key FROM answer_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (now - self.ttl, self.max_entries))]
+            self._conn.executemany("DELETE FROM answer_cache WHERE key = ?", [(k,) for k in evicted])
+            self._conn.commit()
+            if vector is not None:
+                self._add_embedding(key, chash, vector)
+            else:
+                self._remove_embedding(key)
+            for k in evicted:
+                self._remove_embedding(k)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answer_cache")
+            self._conn.commit()
+            self._reset_embeddings()
+
+    def _delete(self, key: str) -> None:
+        self._conn.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+        self._conn.commit()
+        self._remove_embedding(key)
+
+    @staticmethod
+    def _key(question: str, context: str) -> str:
+        return hashlib.sha1(f"{normalize_question(question)}\0{context_hash(context)}".encode("utf-8")).hexdigest()
+
+
+_caches: Dict[str, AnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(db_path: str = DB_PATH) -> Optional[AnswerCache]:
+    """Shared cache for a terms database, or None when caching is disabled"""
+    if not CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = AnswerCache(cache_path_for(db_path))
+        return _caches[db_path]
@@ -0,0 +1,118 @@
+"""
+Bounded worker pool for answering questions from synchronous front ends
+(the Streamlit app), shared by every session of the process.
+
+Each question runs answer_question_stream on one of a fixed number of
+worker threads, so concurrent users share one model, one index and a read
+connection per worker instead of each script thread doing inference on its
+own. Questions beyond the workers wait in a bounded queue; when that is full
+too, submit() raises AnswerPoolBusy rather than letting the backlog grow.
+The retrieval result and the answer chunks are handed to the session
+through a per-question queue, so the session can stream the answer as the
+LLM produces it.
+
+Configuration (environment variables):
+    SIXT_ANSWER_WORKERS     questions answered at once (default 4)
+    SIXT_ANSWER_QUEUE_SIZE  questions waiting for a worker before new ones are turned away (default 16)
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional
+from .db import DB_PATH
+from .qa import answer_question_stream
+
+ANSWER_WORKERS = int(os.getenv('SIXT_ANSWER_WORKERS', '4'))
+ANSWER_QUEUE_SIZE = int(os.getenv('SIXT_ANSWER_QUEUE_SIZE', '16'))
+
+_DONE = object()
+
+
+class AnswerPoolBusy(Exception):
+    """Every worker is busy and the queue is full"""
+
+
+class AnswerJob:
+    """A submitted question; the worker puts the response, the chunks and _DONE on its queue"""
+
+    def __init__(self, question: str, db_path: str):
+        self.question = question
+        self.db_path = db_path
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        self._events: queue.Queue = queue.Queue()
+
+    def run(self) -> None:
+        self.started.set()
+        try:
+            response = answer_question_stream(self.question, self.db_path)
+            self._events.put(dict(response, answer=None))
+            chunks = response["answer"]
+            for chunk in chunks:
+                if self.cancelled.is_set():  # The session went away; free the worker
+                    chunks.close()
+                    break
+                self._events.put(chunk)
+        except Exception as e:
+            self._events.put(e)
+        finally:
+            self._events.put(_DONE)
+
+    def result(self, timeout: Optional[float] = None) -> Dict:
+        """Wait for retrieval; like answer_question_stream, "answer" is an iterator of chunks"""
+        event = self._events.get(timeout=timeout)
+        if isinstance(event, Exception):
+            raise event
+        return dict(event, answer=self._chunks())
+
+    def _chunks(self) -> Iterator[str]:
+        try:
+            while True:
+                event = self._events.get()
+                if event is _DONE:
+                    return
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            self.cancelled.set()
+
+
+class AnswerPool:
+    def __init__(self, workers: int = ANSWER_WORKERS, queue_size: int = ANSWER_QUEUE_SIZE):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='answer')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    def submit(self, question: str, db_path: str = DB_PATH) -> AnswerJob:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise AnswerPoolBusy("Too many questions in progress. Please retry shortly.")
+        job = AnswerJob(question, db_path)
+        with self._lock:
+            self._waiting += 1
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: AnswerJob) -> None:
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+        try:
+            job.run()
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"workers": self.workers, "running": self._running, "waiting": self._waiting,
+                    "rejected": self._rejected}
@@ -0,0 +1,184 @@
+"""
+Offline batch Q&A: answer a list of questions (e.g. an FAQ for a static help
+page) and write the answers with their sources to JSONL.
+
+Questions are retrieved in chunks (one model call and one matrix product
+per chunk), answers are generated by a bounded pool of concurrent LLM calls
+with retry, and every answer is appended to the output as soon as it
+arrives. The output doubles as the checkpoint: re-running the same command
+after a crash skips the questions already answered.
+
+Run from the backend directory:
+    python -m app.batch_qa faq.jsonl answers.jsonl --concurrency 8
+
+Input is JSONL ({"question": ..., "id": ...} per line) or CSV with a
+`question` column (and optionally `id`); without an id the line number is used.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Set, Tuple
+from .db import DB_PATH, prepare_database
+from .qa import ERROR_ANSWER_PREFIX, generate_answer, retrieve_batch, store_answer
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0  # seconds, doubled on every retry
+
+# Source metadata written with every answer (section text is left out)
+SOURCE_FIELDS = ('country', 'vehicle_type', 'section', 'similarity_score', 'bm25_score')
+
+
+def read_questions(path: str) -> List[Dict]:
+    """Questions as [{'id': str, 'question': str}] from a JSONL or CSV file"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    questions = []
+    for n, record in enumerate(records, 1):
+        question = (record.get('question') or '').strip()
+        if question:
+            questions.append({'id': str(record.get('id') or n), 'question': question})
+    return questions
+
+
+def answered_ids(output_path: str) -> Set[str]:
+    """Ids already in the output file (a truncated last line from a crash is ignored)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                continue
+    # Terminate a truncated last line so appended answers start on a line of their own
+    with open(output_path, 'rb+') as f:
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    return done
+
+
+def answer_with_retry(state: Dict, retries: int = DEFAULT_RETRIES,
+                      backoff: float = DEFAULT_BACKOFF) -> Tuple[str, bool]:
+    """Generate an answer, retrying failed LLM calls with exponential backoff; returns (answer, ok)"""
+    for attempt in range(retries + 1):
+        answer = generate_answer(state["question"], state["context"])
+        if ERROR_ANSWER_PREFIX not in answer:
+            store_answer(state, answer)
+            return answer, True
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+    return answer, False
+
+
+def output_record(item: Dict, state: Dict, answer: str) -> Dict:
+    return {
+        'id': item['id'],
+        'question': item['question'],
+        'answer': answer,
+        'cached': state['cached'],
+        'sources': [{field: source[field] for field in SOURCE_FIELDS if field in source}
+                    for source in state['relevant_terms']],
+    }
+
+
+def run_batch(input_path: str, output_path: str, db_path: str = DB_PATH,
+              batch_size: int = DEFAULT_BATCH_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+              retries: int = DEFAULT_RETRIES) -> Dict:
+    """
+    Answer every question of input_path not yet in output_path. Failed
+    questions (after retries) are written to `<output>.failed.jsonl` and
+    picked up again by the next run. Returns run stats.
+    """
+    prepare_database(db_path)
+    questions = read_questions(input_path)
+    done = answered_ids(output_path)
+    pending = [item for item in questions if item['id'] not in done]
+    print(f"📋 {len(questions)} questions, {len(questions) - len(pending)} already answered, "
+          f"{len(pending)} to go")
+
+    stats = {'questions': len(questions), 'skipped': len(questions) - len(pending),
+             'answered': 0, 'cached': 0, 'failed': 0}
+    started = time.perf_counter()
+    failed_path = output_path + '.failed.jsonl'
+    with open(output_path, 'a', encoding='utf-8') as out, open(failed_path, 'w', encoding='utf-8') as failed, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='llm') as pool:
+
+        def write(item, state, answer, ok):
+            record = output_record(item, state, answer)
+            if ok:
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()  # Every written line is checkpointed progress
+                stats['answered'] += 1
+                stats['cached'] += state['cached'] is not None
+            else:
+                failed.write(json.dumps(record, ensure_ascii=False) + '\n')
+                stats['failed'] += 1
+
+        def drain(in_flight, limit):
+            # Write finished answers; block while more than `limit` calls are outstanding
+            while in_flight:
+                finished, _ = wait(in_flight, timeout=None if len(in_flight) > limit else 0,
+                                   return_when=FIRST_COMPLETED)
+                if not finished:
+                    return
+                for future in finished:
+                    item, state = in_flight.pop(future)
+                    write(item, state, *future.result())
+
+        in_flight: Dict = {}
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            states = retrieve_batch([item['question'] for item in chunk], db_path)
+            for item, state in zip(chunk, states):
+                if state['answer'] is not None:
+                    write(item, state, state['answer'], True)
+                else:
+                    in_flight[pool.submit(answer_with_retry, state, retries)] = (item, state)
+            # Retrieve the next chunk while this one is still being answered
+            drain(in_flight, batch_size)
+            elapsed = time.perf_counter() - started
+            print(f"  {stats['answered'] + stats['failed']}/{len(pending)} done, "
+                  f"{len(in_flight)} in flight ({elapsed:.0f}s)")
+        drain(in_flight, 0)
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['questions_per_second'] = ((stats['answered'] + stats['failed']) / stats['seconds']
+                                     if stats['seconds'] else 0.0)
+    if not stats['failed']:
+        os.unlink(failed_path)
+    print(f"✅ Batch finished: {stats['answered']} answered ({stats['cached']} from cache), "
+          f"{stats['failed']} failed in {stats['seconds']:.1f}s "
+          f"({stats['questions_per_second']:.2f} questions/s)")
+    if stats['failed']:
+        print(f"⚠️ Failed questions are in {failed_path}; run again to retry them")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions offline")
+    parser.add_argument('input', help="questions as JSONL or CSV")
+    parser.add_argument('output', help="answers JSONL (appended to; also the resume checkpoint)")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="questions embedded and retrieved together")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="retries per failed LLM call")
+    args = parser.parse_args()
+    run_batch(args.input, args.output, args.db, args.batch_size, args.concurrency, args.retries)
+
+
+if __name__ == "__main__":
+    main()
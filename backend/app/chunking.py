@@ -0,0 +1,99 @@
+"""
+Split rental terms rows into section passages for embedding
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+SECTIONS = ['rental_information', 'payment_information', 'protection_conditions',
+            'authorized_driving_areas', 'extras', 'other_charges_and_taxes', 'vat']
+
+# Sections longer than this are split into overlapping passages; MiniLM only
+# looks at the first 256 word pieces anyway, so longer inputs are truncated.
+MAX_PASSAGE_WORDS = 120
+PASSAGE_OVERLAP_WORDS = 30
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# (row_id, country, vehicle_type, section, content, passage)
+Passage = Tuple[int, str, str, str, str, str]
+
+
+def section_title(section: str) -> str:
+    """Human readable name of a section column"""
+    return section.replace('_', ' ').title()
+
+
+def split_sentences(text: str) -> List[str]:
+    """Non-empty lines of a section, with each line split into sentences"""
+    return [sentence for line in text.splitlines() if line.strip()
+            for sentence in _SENTENCE_END.split(line.strip())]
+
+
+def _split_units(text: str, max_words: int) -> List[str]:
+    """Break text into lines, and over-long lines into sentences or word runs"""
+    units = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(line.split()) <= max_words:
+            units.append(line)
+            continue
+        for sentence in _SENTENCE_END.split(line):
+            words = sentence.split()
+            for i in range(0, len(words), max_words):
+                units.append(' '.join(words[i:i + max_words]))
+    return units
+
+
+def split_into_passages(text: str, max_words: int = MAX_PASSAGE_WORDS,
+                        overlap_words: int = PASSAGE_OVERLAP_WORDS) -> List[str]:
+    """
+    Split a section into passages of at most max_words words. Consecutive
+    passages share up to overlap_words words of trailing lines so an answer
+    spanning a boundary is still found in one piece.
+    """
+    units = _split_units(text, max_words)
+    counts = [len(u.split()) for u in units]
+    if sum(counts) <= max_words:
+        return ['\n'.join(units)] if units else []
+
+    passages = []
+    start = 0
+    while start < len(units):
+        end, words = start, 0
+        while end < len(units) and (end == start or words + counts[end] <= max_words):
+            words += counts[end]
+            end += 1
+        passages.append('\n'.join(units[start:end]))
+        if end >= len(units):
+            break
+        # Step back over trailing units to create the overlap, always moving forward
+        back, overlap = end, 0
+        while back - 1 > start and overlap + counts[back - 1] <= overlap_words:
+            back -= 1
+            overlap += counts[back]
+        start = back
+    return passages
+
+
+def chunk_row(row: Dict) -> List[Passage]:
+    """Turn one rental_terms row into passages, one or more per non-empty section"""
+    row_id = row['id']
+    country = row.get('country') or 'Unknown'
+    vehicle_type = row.get('vehicle_type') or 'Unknown'
+    passages = []
+    for section in SECTIONS:
+        content = row.get(section) or ''
+        if not content.strip():
+            continue
+        for passage in split_into_passages(content):
+            passages.append((row_id, country, vehicle_type, section, content, passage))
+    return passages
+
+
+def embedding_text(passage: Passage) -> str:
+    """Text that gets embedded: the passage prefixed with its country, vehicle and section"""
+    _, country, vehicle_type, section, _, text = passage
+    return f"{country} - {vehicle_type} - {section_title(section)}: {text}"
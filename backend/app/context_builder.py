@@ -0,0 +1,159 @@
+"""
+Build the LLM context from retrieved sections under an explicit token budget.
+
+Sections are taken best first (by fused score, or in the reranker's order
+when they have been reranked), each appears once (identical text from
+several rows or sections is deduplicated, down to single sentences), and a
+section that doesn't fit its share of the budget is trimmed to its most
+relevant sentences. Prompt size drives LLM latency and cost, so the number
+of tokens used is reported with the context.
+
+Tokens are estimated at ~4 characters per token, the usual rule of thumb
+for English text with Gemini and GPT-style tokenizers; no tokenizer is
+loaded on the request path.
+
+Configuration (environment variables):
+    SIXT_CONTEXT_TOKENS  token budget of the rental terms context (default 1500)
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, Set, Tuple
+from .chunking import section_title, split_sentences
+from .lexical_search import STOPWORDS
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('SIXT_CONTEXT_TOKENS', '1500'))
+
+# Characters per token for the estimate
+CHARS_PER_TOKEN = 4
+
+# Share of the remaining budget a single section may take, so the best
+# section can't crowd out everything else
+SECTION_SHARE = 0.5
+
+# Question words are matched on their first letters ("driving" ~ "drive")
+STEM_LENGTH = 5
+
+# Shorter lines (headings like "Deductibles:") are kept even when repeated,
+# since they give the lines under them their meaning
+MIN_DEDUPE_WORDS = 5
+
+# Marks sentences left out between the ones kept from a trimmed section
+OMITTED = "[...]"
+
+NO_CONTEXT = "No relevant rental terms found."
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _stems(text: str) -> Set[str]:
+    return {word[:STEM_LENGTH] for word in re.findall(r'\w+', text.lower()) if word not in STOPWORDS}
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+
+def _score(result: Dict) -> float:
+    """Ranking score of a retrieved section (fused when available)"""
+    for field in ('rrf_score', 'similarity_score', 'bm25_score'):
+        if result.get(field) is not None:
+            return float(result[field])
+    return 0.0
+
+
+def _trim(sentences: List[str], question_stems: Set[str], passage: str,
+          budget: int) -> Tuple[str, int, int]:
+    """
+    Keep the most relevant sentences that fit the budget, in their original
+    order; returns (text, tokens, sentences kept). A sentence scores one
+    point per question word it contains, plus a bonus when it is part of the
+    passage that matched the search.
+    """
+    passage = _normalize(passage)
+    scored = []
+    for i, sentence in enumerate(sentences):
+        score = len(question_stems & _stems(sentence))
+        if passage and _normalize(sentence) in passage:
+            score += 0.5
+        scored.append((-score, i))
+    chosen, used = [], 0
+    for _, i in sorted(scored):
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+    chosen.sort()
+    parts = []
+    for n, i in enumerate(chosen):
+        if n and i != chosen[n - 1] + 1:
+            parts.append(OMITTED)
+            used += estimate_tokens(OMITTED) + 1
+        parts.append(sentences[i])
+    return '\n'.join(parts), used, len(chosen)
+
+
+def build_context(question: str, results: List[Dict],
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Turn retrieved sections into the prompt context. Returns the context and
+    stats: tokens used, the budget, and how many sections were included,
+    trimmed, dropped for lack of budget or skipped as duplicates.
+    """
+    stats = {'tokens': 0, 'budget': budget, 'sections': 0, 'trimmed': 0, 'dropped': 0, 'duplicates': 0}
+    if not results:
+        stats['tokens'] = estimate_tokens(NO_CONTEXT)
+        return NO_CONTEXT, stats
+
+    question_stems = _stems(question)
+    seen_sections: Set[Tuple] = set()
+    seen_sentences: Set[str] = set()
+    blocks = []
+    remaining = budget
+    # When everything fits, nothing needs to be trimmed
+    fits = sum(estimate_tokens(r.get('content') or '') + 16 for r in results) <= budget
+    # Reranked results arrive in the cross-encoder's order, which the
+    # first-stage scores they still carry would undo
+    if not any('rerank_score' in r for r in results):
+        results = sorted(results, key=_score, reverse=True)
+    for result in results:
+        content = result.get('content') or ''
+        key = (result.get('row_id'), result.get('section'))
+        if key in seen_sections or _normalize(content) in seen_sections:
+            stats['duplicates'] += 1
+            continue
+        seen_sections.update({key, _normalize(content)})
+
+        sentences = []
+        for sentence in split_sentences(content):
+            normalized = _normalize(sentence)
+            if len(sentence.split()) < MIN_DEDUPE_WORDS:
+                sentences.append(sentence)
+            elif normalized not in seen_sentences:
+                seen_sentences.add(normalized)
+                sentences.append(sentence)
+        if not sentences:
+            stats['duplicates'] += 1
+            continue
+
+        header = (f"[{len(blocks) + 1}] {result.get('country', 'Unknown')} - "
+                  f"{result.get('vehicle_type', 'Unknown')} - {section_title(result.get('section', ''))}:")
+        header_tokens = estimate_tokens(header) + 1
+        # Room for at least a sentence or two, even late in the budget
+        share = remaining if fits else max(int(remaining * SECTION_SHARE), min(remaining, header_tokens + 32))
+        text, used, kept = _trim(sentences, question_stems, result.get('passage') or '', share - header_tokens)
+        if not kept:
+            stats['dropped'] += 1
+            continue
+        if kept < len(sentences):
+            stats['trimmed'] += 1
+        blocks.append(f"{header}\n{text}")
+        remaining -= header_tokens + used + 1
+        stats['sections'] += 1
+
+    context = '\n\n'.join(blocks) if blocks else NO_CONTEXT
+    stats['tokens'] = estimate_tokens(context)
+    return context, stats
@@ -1,9 +1,164 @@
 import sqlite3
 import os
+import threading
+from pathlib import Path
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sixt_terms.db")
+DB_PATH = os.getenv('SIXT_DB_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), "sixt_terms.db"))
+
+# Section columns of rental_terms that are indexed for full-text search
+FTS_SECTIONS = ['rental_information', 'payment_information', 'protection_conditions',
+                'authorized_driving_areas', 'extras', 'other_charges_and_taxes', 'vat']
+
+# Columns of a rental_terms row as written by the scraper and the sample data
+TERMS_COLUMNS = ['country', 'vehicle_type'] + FTS_SECTIONS
+
+# Each section gets FTS rowid = rental_terms.id * FTS_ROWID_STRIDE + section position,
+# so a row's entries can be deleted with a cheap rowid range
+FTS_ROWID_STRIDE = 16
+
+# Memory-mapped I/O for read connections (bytes); the whole terms database fits
+READ_MMAP_SIZE = 256 * 1024 * 1024
+
+_read_connections = threading.local()
 
 def get_db_connection(db_path=DB_PATH):
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
-    return conn 
\ No newline at end of file
+    return conn
+
+def get_read_connection(db_path=DB_PATH):
+    """
+    Read-only connection for the query path, opened once per thread and
+    database (`mode=ro` URI, memory-mapped) and reused. Don't close it.
+    """
+    pool = getattr(_read_connections, 'pool', None)
+    if pool is None:
+        pool = _read_connections.pool = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size={READ_MMAP_SIZE}")
+        pool[db_path] = conn
+    return conn
+
+def ensure_generation(conn):
+    """
+    Generation counter of rental_terms, bumped by triggers on every insert,
+    update and delete, so readers can tell cheaply whether anything changed.
+    """
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS terms_meta (
+            name TEXT PRIMARY KEY,
+            value INTEGER
+        );
+        INSERT OR IGNORE INTO terms_meta VALUES ('generation', 1);
+        CREATE TRIGGER IF NOT EXISTS rental_terms_generation_insert AFTER INSERT ON rental_terms BEGIN
+            UPDATE terms_meta SET value = value + 1 WHERE name = 'generation';
+        END;
+        CREATE TRIGGER IF NOT EXISTS rental_terms_generation_update AFTER UPDATE ON rental_terms BEGIN
+            UPDATE terms_meta SET value = value + 1 WHERE name = 'generation';
+        END;
+        CREATE TRIGGER IF NOT EXISTS rental_terms_generation_delete AFTER DELETE ON rental_terms BEGIN
+            UPDATE terms_meta SET value = value + 1 WHERE name = 'generation';
+        END;
+    """)
+    conn.commit()
+
+def db_generation(db_path=DB_PATH):
+    """
+    Current generation of rental_terms. Databases without the counter (or
+    not there at all) report 0.
+    """
+    try:
+        row = get_read_connection(db_path).execute(
+            "SELECT value FROM terms_meta WHERE name = 'generation'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+def prepare_database(db_path=DB_PATH):
+    """Create / backfill the full-text index and the generation counter if needed"""
+    conn = get_db_connection(db_path)
+    try:
+        ensure_fts(conn)
+        ensure_generation(conn)
+    finally:
+        conn.close()
+
+def configure_for_writes(conn):
+    """
+    Pragmas for bulk writes: WAL (readers aren't blocked and commits append
+    to the log instead of rewriting pages), fsync only at checkpoints, temp
+    tables in memory and a larger page cache.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")  # KiB
+
+def ensure_unique_terms(conn):
+    """
+    Unique index on rental_terms (country, vehicle_type), the conflict target
+    of upserts. Duplicates left by older scrapes are removed first, keeping
+    the most recent row.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'rental_terms_country_vehicle'").fetchone()
+    if exists:
+        return
+    removed = conn.execute("""
+        DELETE FROM rental_terms WHERE id NOT IN (
+            SELECT MAX(id) FROM rental_terms GROUP BY country, vehicle_type
+        )
+    """).rowcount
+    if removed:
+        print(f"🧹 Removed {removed} duplicate rental_terms rows")
+    conn.execute("CREATE UNIQUE INDEX rental_terms_country_vehicle ON rental_terms (country, vehicle_type)")
+    conn.commit()
+
+def ensure_fts(conn):
+    """
+    Create the rental_terms_fts full-text index (one entry per non-empty
+    section) and the triggers that keep it in sync with rental_terms, and
+    backfill it for rows inserted before it existed.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(rental_terms)")}
+    sections = [(i, s) for i, s in enumerate(FTS_SECTIONS) if s in columns]
+    if not sections:
+        return
+
+    def insert_sql(ref, source=""):
+        # `ref` is the row alias: NEW inside triggers, the table itself for the backfill
+        selects = [
+            f"SELECT {ref}.id * {FTS_ROWID_STRIDE} + {i}, {ref}.country, {ref}.vehicle_type, '{s}', {ref}.{s}"
+            f"{source} WHERE trim(coalesce({ref}.{s}, '')) != ''"
+            for i, s in sections
+        ]
+        return ("INSERT INTO rental_terms_fts (rowid, country, vehicle_type, section, content) "
+                + " UNION ALL ".join(selects))
+
+    delete_sql = (f"DELETE FROM rental_terms_fts WHERE rowid BETWEEN old.id * {FTS_ROWID_STRIDE} "
+                  f"AND old.id * {FTS_ROWID_STRIDE} + {FTS_ROWID_STRIDE - 1}")
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'rental_terms_fts'").fetchone()
+    conn.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS rental_terms_fts USING fts5(
+            country, vehicle_type, section UNINDEXED, content,
+            tokenize = 'porter unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS rental_terms_fts_insert AFTER INSERT ON rental_terms BEGIN
+            {insert_sql('new')};
+        END;
+        CREATE TRIGGER IF NOT EXISTS rental_terms_fts_delete AFTER DELETE ON rental_terms BEGIN
+            {delete_sql};
+        END;
+        CREATE TRIGGER IF NOT EXISTS rental_terms_fts_update AFTER UPDATE ON rental_terms BEGIN
+            {delete_sql};
+            {insert_sql('new')};
+        END;
+    """)
+    if not exists:
+        conn.execute(insert_sql('rental_terms', ' FROM rental_terms'))
+    conn.commit()
@@ -0,0 +1,269 @@
+"""
+Persistent embedding index for rental terms documents.
+
+Document embeddings are computed once and stored next to the SQLite database
+(`<db name>.index.npy` for the matrix, `<db name>.index.json` for the keys), so
+a query only has to encode the question and do one matrix multiply.  Every
+vector is keyed by (row id, section, content hash); when rows change only the
+documents whose key is new get re-encoded.
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .db import DB_PATH
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+from .vector_backends import (ExactBackend, IVFBackend, VECTOR_BACKEND, VECTOR_PRECISION, atomic_file,
+                              backend_kind, top_k_indices)
+
+IndexKey = Tuple[int, str, str]
+
+
+def index_path_for(db_path: str = DB_PATH) -> str:
+    """Return the index path prefix that lives next to the given database"""
+    return os.path.splitext(db_path)[0] + ".index"
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of the text that gets embedded"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# Rows hashed into the digest that ties an index .json to its .npy
+DIGEST_ROWS = 256
+
+
+def matrix_digest(embeddings: np.ndarray) -> str:
+    """Hash of the matrix shape and an evenly spaced sample of its rows (cheap, even when memory-mapped)"""
+    step = max(1, len(embeddings) // DIGEST_ROWS)
+    sample = np.ascontiguousarray(embeddings[::step], dtype=np.float32)
+    return hashlib.sha1(repr(embeddings.shape).encode("utf-8") + sample.tobytes()).hexdigest()
+
+
+@contextmanager
+def index_file_lock(path: str):
+    """Exclusive cross-process lock so only one worker rebuilds a shared index at a time"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class EmbeddingIndex:
+    """Matrix of L2-normalised document embeddings plus the key of each row"""
+
+    def __init__(self, model_name: str, keys: Optional[List[IndexKey]] = None,
+                 embeddings: Optional[np.ndarray] = None):
+        self.model_name = model_name
+        self.keys: List[IndexKey] = keys or []
+        self.embeddings = embeddings if embeddings is not None else np.zeros((0, 0), dtype=np.float32)
+        self.documents: List[tuple] = []
+        # Database generation (db.db_generation) the documents were read at
+        self.generation: Optional[int] = None
+        self.backend = None
+        self._fingerprint: Optional[str] = None
+        # (country, vehicle_type) -> contiguous (start, end) ranges of document positions
+        self.partitions: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        # (row id, section) -> positions of that section's passages
+        self.section_positions: Dict[Tuple[int, str], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def fingerprint(self) -> str:
+        """Hash identifying the exact set and order of vectors in the index"""
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for key in self.keys:
+                digest.update(key[2].encode("ascii"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def prepare_backend(self, path: Optional[str] = None, kind: Optional[str] = None,
+                        precision: Optional[str] = None) -> None:
+        """
+        Set up the vector search backend for the current vectors. An IVF
+        quantiser is reused from `path` when it matches, otherwise trained
+        and saved there. With a precision other than float32 the backend
+        scans quantised vectors and rescores the best ones in float32.
+        """
+        kind = backend_kind(len(self.keys), kind or VECTOR_BACKEND)
+        precision = (precision or VECTOR_PRECISION) if self.keys else 'float32'
+        if kind == 'exact':
+            self.backend = ExactBackend(self.embeddings, precision)
+        else:
+            fingerprint = self.fingerprint()
+            backend = IVFBackend.load(path, self.embeddings, fingerprint, precision=precision) if path else None
+            if backend is None:
+                print(f"🧭 Training IVF index over {len(self.keys)} vectors...")
+                backend = IVFBackend.build(self.embeddings, precision=precision)
+                if path:
+                    backend.save(path, fingerprint)
+            self.backend = backend
+        if self.backend.quantized is not None:
+            print(f"🗜️ Scanning {precision} vectors: {self.backend.quantized.nbytes / 1024 / 1024:.1f} MiB "
+                  f"instead of {self.embeddings.nbytes / 1024 / 1024:.1f} MiB in float32")
+
+    @classmethod
+    def load(cls, path: str, model_name: str, mmap: bool = False) -> Optional["EmbeddingIndex"]:
+        """
+        Load an index from disk, or None if missing, unreadable or built with
+        another model. With mmap the matrix is mapped read-only, so every
+        process using the same file shares one copy in the page cache.
+        """
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            embeddings = np.load(path + ".npy", mmap_mode="r" if mmap else None)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"⚠️ Ignoring unreadable embedding index at {path}: {e}")
+            return None
+
+        keys = [tuple(k) for k in meta.get("keys", [])]
+        if meta.get("model") != model_name or len(keys) != len(embeddings):
+            print("⚠️ Embedding index is stale for this model, rebuilding")
+            return None
+        # Two writers racing can leave one's .npy next to the other's .json
+        digest = meta.get("digest")  # Missing in indexes written before it was added
+        if meta.get("count", len(keys)) != len(embeddings) or (digest and digest != matrix_digest(embeddings)):
+            print(f"⚠️ Embedding index files at {path} don't belong together, rebuilding")
+            return None
+        if embeddings.dtype != np.float32:
+            embeddings = embeddings.astype(np.float32)
+        return cls(model_name, keys, embeddings)
+
+    def save(self, path: str) -> None:
+        """
+        Atomically write the matrix, then its keys. The keys file records the
+        vector count and a digest of the matrix, so load() can tell when the
+        .npy on disk was written by another process.
+        """
+        meta = {"model": self.model_name, "dim": int(self.embeddings.shape[1]),
+                "count": len(self.keys), "digest": matrix_digest(self.embeddings),
+                "keys": [list(k) for k in self.keys]}
+        with atomic_file(path + ".npy", "wb") as f:
+            np.save(f, self.embeddings)
+        with atomic_file(path + ".json", "w") as f:
+            json.dump(meta, f)
+
+    def update(self, documents: Sequence[tuple], entries: Sequence[Tuple[int, str, str]],
+               encode: Callable[[List[str]], np.ndarray]) -> int:
+        """
+        Reconcile the index with the current documents.
+
+        `entries` holds the (row id, section, text to embed) of each document.
+        Vectors of unchanged texts are reused; only new or modified texts are
+        passed to `encode`. Returns the number of distinct texts encoded.
+        """
+        keys = [(int(row_id), section, content_hash(text)) for row_id, section, text in entries]
+
+        # Vectors are looked up by content hash, so identical texts (e.g.
+        # boilerplate shared by several rows) are only ever encoded once
+        known = {key[2]: i for i, key in enumerate(self.keys)}
+        pending: Dict[str, str] = {}
+        for key, (_, _, text) in zip(keys, entries):
+            if key[2] not in known:
+                pending.setdefault(key[2], text)
+
+        new_vectors = np.zeros((0, self.embeddings.shape[1]), dtype=np.float32)
+        if pending:
+            new_vectors = np.asarray(encode(list(pending.values())), dtype=np.float32)
+        new_rows = {h: n for n, h in enumerate(pending)}
+
+        matrix = np.empty((len(keys), new_vectors.shape[1]), dtype=np.float32)
+        for i, key in enumerate(keys):
+            j = known.get(key[2])
+            matrix[i] = self.embeddings[j] if j is not None else new_vectors[new_rows[key[2]]]
+
+        self.keys = keys
+        self.embeddings = matrix
+        self.documents = list(documents)
+        self.backend = None
+        self._fingerprint = None
+        self._build_partitions()
+        return len(pending)
+
+    def _build_partitions(self) -> None:
+        """
+        Group document positions by (country, vehicle_type) as runs of
+        consecutive rows, and by (row id, section) for candidate lookups
+        """
+        partitions: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        sections: Dict[Tuple[int, str], List[int]] = {}
+        for i, doc in enumerate(self.documents):
+            ranges = partitions.setdefault((doc[1], doc[2]), [])
+            if ranges and ranges[-1][1] == i:
+                ranges[-1] = (ranges[-1][0], i + 1)
+            else:
+                ranges.append((i, i + 1))
+            sections.setdefault((doc[0], doc[3]), []).append(i)
+        self.partitions = partitions
+        self.section_positions = sections
+
+    def countries(self) -> List[str]:
+        return sorted({country for country, _ in self.partitions})
+
+    def vehicle_types(self) -> List[str]:
+        return sorted({vehicle_type for _, vehicle_type in self.partitions})
+
+    def _search_partitions(self, query: np.ndarray, top_k: int, country: Optional[str],
+                           vehicle_type: Optional[str]) -> List[Tuple[int, float]]:
+        """Exact search restricted to the matching partitions; each range is scored as a zero-copy slice"""
+        ranges = [r for (c, v), rs in self.partitions.items()
+                  if (country is None or c.lower() == country.lower())
+                  and (vehicle_type is None or v.lower() == vehicle_type.lower())
+                  for r in rs]
+        if not ranges:
+            return []
+        ids = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([self.embeddings[start:end] @ query for start, end in ranges])
+        top = top_k_indices(scores, top_k)
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def search_sections(self, query: np.ndarray, top_k: int,
+                        sections: Sequence[Tuple[int, str]]) -> List[Tuple[int, float]]:
+        """Exact search over the passages of the given (row id, section) candidates only"""
+        ids = np.array([i for key in sections for i in self.section_positions.get(key, [])], dtype=np.int64)
+        if not len(ids) or top_k <= 0:
+            return []
+        scores = self.embeddings[ids] @ np.asarray(query, dtype=np.float32)
+        top = top_k_indices(scores, top_k)
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def search(self, query_embedding: np.ndarray, top_k: int, country: Optional[str] = None,
+               vehicle_type: Optional[str] = None) -> List[Tuple[int, float]]:
+        """
+        Return (document position, cosine score) pairs for the top_k documents,
+        optionally only among documents of the given country and/or vehicle type
+        """
+        if not self.keys or top_k <= 0:
+            return []
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        if country or vehicle_type:
+            return self._search_partitions(query_embedding, top_k, country, vehicle_type)
+        if self.backend is None:
+            self.prepare_backend()
+        ids, scores = self.backend.search(query_embedding, top_k)
+        return [(int(i), float(score)) for i, score in zip(ids, scores)]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        """Unfiltered search for several queries at once (one matrix product on the exact backend)"""
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if not self.keys or top_k <= 0:
+            return [[] for _ in query_embeddings]
+        if self.backend is None:
+            self.prepare_backend()
+        return [[(int(i), float(score)) for i, score in zip(ids, scores)]
+                for ids, scores in self.backend.search_batch(query_embeddings, top_k)]
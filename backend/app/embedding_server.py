@@ -0,0 +1,133 @@
+"""
+Embedding sidecar: one process loads the sentence transformer and serves
+encode requests to every API worker over a Unix socket, so workers never
+import torch or hold their own copy of the model.
+
+Start it next to the API (from the backend directory):
+    python -m app.embedding_server --socket /tmp/sixt-embeddings.sock
+
+and point the workers at it with SIXT_EMBEDDING_SOCKET=/tmp/sixt-embeddings.sock.
+
+Wire format (both directions length-prefixed, network byte order):
+    request:  uint32 length + JSON list of texts
+    response: uint32 rows + uint32 dim + rows * dim little-endian float32
+              (rows == 0xFFFFFFFF signals an error; dim is then the length
+              of a UTF-8 error message that follows)
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import numpy as np
+from typing import List
+
+ERROR_ROWS = 0xFFFFFFFF
+
+
+def _read_exact(stream, n: int) -> bytes:
+    data = stream.read(n)
+    if len(data) < n:
+        raise ConnectionError("Embedding socket closed")
+    return data
+
+
+class EncodeHandler(socketserver.StreamRequestHandler):
+    """Serves encode requests on one client connection until it closes"""
+
+    def handle(self):
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4:
+                return
+            (length,) = struct.unpack("!I", header)
+            try:
+                texts = json.loads(_read_exact(self.rfile, length))
+                vectors = self.server.encode(texts)
+                self.wfile.write(struct.pack("!II", *vectors.shape) + vectors.astype("<f4").tobytes())
+            except ConnectionError:
+                return
+            except Exception as e:
+                message = str(e).encode("utf-8")
+                self.wfile.write(struct.pack("!II", ERROR_ROWS, len(message)) + message)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        # Imported here so clients of this module never pull in the model stack
+        from .semantic_search import encode_texts_locally, load_encoder
+        load_encoder()
+        self._encode = encode_texts_locally
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, EncodeHandler)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        # One forward pass at a time; callers already batch their texts
+        with self._lock:
+            return self._encode(texts)
+
+
+class RemoteEncoder:
+    """Client for the embedding sidecar, one persistent connection per thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+        return conn
+
+    def _reset(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn:
+            conn[1].close()
+            conn[0].close()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        payload = json.dumps(list(texts)).encode("utf-8")
+        for attempt in range(2):
+            try:
+                sock, reader = self._connection()
+                sock.sendall(struct.pack("!I", len(payload)) + payload)
+                rows, dim = struct.unpack("!II", _read_exact(reader, 8))
+                break
+            except (ConnectionError, OSError):
+                # The sidecar may have restarted; reconnect once
+                self._reset()
+                if attempt:
+                    raise
+        if rows == ERROR_ROWS:
+            raise RuntimeError(f"Embedding server error: {_read_exact(reader, dim).decode('utf-8')}")
+        data = _read_exact(reader, rows * dim * 4)
+        return np.frombuffer(data, dtype="<f4").reshape(rows, dim).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings over a Unix socket")
+    parser.add_argument("--socket", default=os.getenv("SIXT_EMBEDDING_SOCKET", "/tmp/sixt-embeddings.sock"))
+    args = parser.parse_args()
+
+    server = EmbeddingServer(args.socket)
+    print(f"✅ Embedding server listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
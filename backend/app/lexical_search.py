@@ -0,0 +1,92 @@
+"""
+Lexical (BM25) search over the rental_terms_fts full-text index, and
+reciprocal-rank fusion of lexical and semantic results
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, Optional
+from .db import get_read_connection, DB_PATH, FTS_ROWID_STRIDE
+
+# Words that carry no signal for BM25 and would only add noise to the OR query
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how',
+    'i', 'if', 'in', 'is', 'it', 'my', 'of', 'on', 'or', 'the', 'to', 'what', 'when', 'where',
+    'which', 'who', 'will', 'with', 'you', 'your', 'me', 'much', 'there', 'any', 'need',
+}
+
+# Constant of reciprocal-rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+
+
+def fts_query(question: str) -> Optional[str]:
+    """
+    Turn a question into an FTS5 OR-query. Each word becomes a quoted term
+    (so punctuation can't break the syntax); words that tokenize into several
+    parts, like "$2,500", become a phrase ("2 500").
+    """
+    terms = []
+    for word in question.split():
+        parts = re.findall(r'\w+', word.lower())
+        if not parts or (len(parts) == 1 and parts[0] in STOPWORDS):
+            continue
+        term = '"' + ' '.join(parts) + '"'
+        if term not in terms:
+            terms.append(term)
+    return ' OR '.join(terms) if terms else None
+
+
+def lexical_search(query: str, db_path: str = DB_PATH, limit: int = 20,
+                   country: Optional[str] = None, vehicle_type: Optional[str] = None) -> List[Dict]:
+    """
+    Rank sections by BM25 against the question.
+    Returns dictionaries shaped like semantic search results, plus `bm25_score`
+    (higher is better).
+    """
+    match = fts_query(query)
+    if not match:
+        return []
+
+    sql = ("SELECT rowid, country, vehicle_type, section, content, -bm25(rental_terms_fts) AS score "
+           "FROM rental_terms_fts WHERE rental_terms_fts MATCH ?")
+    params: list = [match]
+    if country:
+        sql += " AND country = ? COLLATE NOCASE"
+        params.append(country)
+    if vehicle_type:
+        sql += " AND vehicle_type = ? COLLATE NOCASE"
+        params.append(vehicle_type)
+    sql += " ORDER BY score DESC LIMIT ?"
+    params.append(limit)
+
+    try:
+        rows = get_read_connection(db_path).execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        # Database without the FTS index (see db.ensure_fts): no lexical results
+        print(f"Lexical search unavailable: {e}")
+        return []
+
+    return [{
+        'row_id': row['rowid'] // FTS_ROWID_STRIDE,
+        'country': row['country'],
+        'vehicle_type': row['vehicle_type'],
+        'section': row['section'],
+        'content': row['content'],
+        'bm25_score': row['score'],
+    } for row in rows]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], top_k: int, k: int = RRF_K) -> List[Dict]:
+    """
+    Merge ranked result lists by summing 1 / (k + rank) per section.
+    Fields from every list are kept (e.g. both similarity_score and bm25_score).
+    """
+    fused: Dict[tuple, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = (result['row_id'], result['section'])
+            entry = fused.setdefault(key, {'rrf_score': 0.0})
+            for field, value in result.items():
+                entry.setdefault(field, value)
+            entry['rrf_score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda r: r['rrf_score'], reverse=True)[:top_k]
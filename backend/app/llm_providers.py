@@ -0,0 +1,210 @@
+"""
+LLM providers behind one interface, so the rest of the pipeline doesn't
+care which model answers:
+
+- `gemini`: Google Gemini through google.generativeai
+- `openai`: any OpenAI-compatible chat completions server (llama.cpp,
+  vLLM, Ollama, ...), e.g. a local model at http://localhost:8080/v1
+- `fake`: deterministic offline answers with configurable latency and
+  token rate, for benchmarks and load tests without the network
+
+Each provider builds its client once and reuses it for every call.
+
+Configuration (environment variables):
+    SIXT_LLM_PROVIDER              gemini (default), openai or fake
+    SIXT_LLM_TIMEOUT               seconds per HTTP call (default 60)
+    SIXT_GEMINI_MODEL              default gemini-1.5-flash (key in GOOGLE_API_KEY)
+    SIXT_OPENAI_BASE_URL           default http://localhost:8080/v1
+    SIXT_OPENAI_MODEL              model name sent to the server (default local-model)
+    SIXT_OPENAI_API_KEY            bearer token, if the server wants one
+    SIXT_FAKE_LLM_LATENCY_MS       time to first token (default 200)
+    SIXT_FAKE_LLM_TOKENS_PER_SECOND  generation speed (default 50)
+    SIXT_FAKE_LLM_ANSWER_TOKENS    answer length in words (default 60)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+LLM_PROVIDER = os.getenv('SIXT_LLM_PROVIDER', 'gemini')
+LLM_TIMEOUT = float(os.getenv('SIXT_LLM_TIMEOUT', '60'))
+GEMINI_MODEL = os.getenv('SIXT_GEMINI_MODEL', 'gemini-1.5-flash')
+OPENAI_BASE_URL = os.getenv('SIXT_OPENAI_BASE_URL', 'http://localhost:8080/v1')
+OPENAI_MODEL = os.getenv('SIXT_OPENAI_MODEL', 'local-model')
+OPENAI_API_KEY = os.getenv('SIXT_OPENAI_API_KEY', '')
+FAKE_LATENCY_MS = float(os.getenv('SIXT_FAKE_LLM_LATENCY_MS', '200'))
+FAKE_TOKENS_PER_SECOND = float(os.getenv('SIXT_FAKE_LLM_TOKENS_PER_SECOND', '50'))
+FAKE_ANSWER_TOKENS = int(os.getenv('SIXT_FAKE_LLM_ANSWER_TOKENS', '60'))
+
+
+class LLMProvider:
+    """
+    Text generation interface. Subclasses implement `generate` and `stream`;
+    the async variants default to running those on a worker thread.
+    """
+
+    name = 'base'
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(None, self.generate, prompt)
+
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        chunks = self.stream(prompt)
+        done = object()
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+
+
+class GeminiProvider(LLMProvider):
+    name = 'gemini'
+
+    def __init__(self, model_name: str = GEMINI_MODEL, api_key: Optional[str] = None):
+        # Imported here so other providers never load the Google client
+        import google.generativeai as genai  # type: ignore
+        genai.configure(api_key=api_key or os.getenv('GOOGLE_API_KEY'))  # type: ignore
+        self.model = genai.GenerativeModel(model_name)  # type: ignore
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    async def generate_async(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Chat completions over HTTP, through one pooled session"""
+
+    name = 'openai'
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, model_name: str = OPENAI_MODEL,
+                 api_key: str = OPENAI_API_KEY, timeout: float = LLM_TIMEOUT, pool_size: int = 32):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.model_name = model_name
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def _post(self, prompt: str, stream: bool):
+        resp = self.session.post(self.url, timeout=self.timeout, stream=stream, json={
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'stream': stream,
+        })
+        resp.raise_for_status()
+        return resp
+
+    def generate(self, prompt: str) -> str:
+        return self._post(prompt, stream=False).json()['choices'][0]['message']['content']
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # Server-sent events: "data: {json chunk}" lines, ending with "data: [DONE]"
+        with self._post(prompt, stream=True) as resp:
+            for line in resp.iter_lines():
+                line = line.decode('utf-8')
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    return
+                text = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                if text:
+                    yield text
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic answers built from the prompt's context, delivered after
+    `latency_ms` at `tokens_per_second` (one word per token). The async
+    variants sleep on the event loop, so no threads are held while "generating".
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency_ms: float = FAKE_LATENCY_MS, tokens_per_second: float = FAKE_TOKENS_PER_SECOND,
+                 answer_tokens: int = FAKE_ANSWER_TOKENS):
+        self.latency = latency_ms / 1000
+        self.token_interval = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.answer_tokens = answer_tokens
+
+    def tokens(self, prompt: str):
+        """The answer for a prompt, as a list of tokens (the same prompt always gives the same answer)"""
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        context = prompt.split('Rental Terms Information:', 1)[-1].split('Customer Question:', 1)[0]
+        words = context.split()
+        body = (words * (self.answer_tokens // max(len(words), 1) + 1))[:self.answer_tokens] if words else []
+        return [f"[fake {digest}]"] + [' ' + word for word in body]
+
+    def generate(self, prompt: str) -> str:
+        tokens = self.tokens(prompt)
+        time.sleep(self.latency + self.token_interval * len(tokens))
+        return ''.join(tokens)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(self.latency)
+        for token in self.tokens(prompt):
+            time.sleep(self.token_interval)
+            yield token
+
+    async def generate_async(self, prompt: str) -> str:
+        tokens = self.tokens(prompt)
+        await asyncio.sleep(self.latency + self.token_interval * len(tokens))
+        return ''.join(tokens)
+
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for token in self.tokens(prompt):
+            await asyncio.sleep(self.token_interval)
+            yield token
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'openai': OpenAICompatibleProvider,
+    'fake': FakeProvider,
+}
+
+_providers: Dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    """The shared provider instance (SIXT_LLM_PROVIDER unless a name is given)"""
+    name = name or LLM_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = PROVIDERS[name]()
+        return _providers[name]
@@ -1,7 +1,20 @@
-from fastapi import FastAPI, Query
+import time
+_process_started = time.perf_counter()  # Before the imports below, for the startup report
+
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from app.qa import answer_question
+from app.qa import answer_question_async, stream_answer_async
+from app.semantic_search import get_index, get_batcher, encode_texts
+from app.reranker import get_reranker
+from app.db import prepare_database
+from app.llm_providers import LLM_PROVIDER
+from app.metrics import CONTENT_TYPE, render_metrics
+import asyncio
+import json
+import os
+import threading
 
 app = FastAPI()
 
@@ -13,28 +26,166 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Backpressure: /ask requests accepted at once (in flight or waiting for a
+# LLM slot); beyond this clients get 429 instead of queueing without bound
+MAX_PENDING_REQUESTS = int(os.getenv('SIXT_MAX_PENDING_REQUESTS', '64'))
+# Seconds a single /ask request may take before it is abandoned with 504
+REQUEST_TIMEOUT = float(os.getenv('SIXT_REQUEST_TIMEOUT', '30'))
+
+_pending_requests = 0
+
+# Startup: seconds per stage, and whether the index is loaded and the encoder warm (see /ready)
+_startup: dict = {}
+_ready = threading.Event()
+
+# Source metadata sent at the end of a streamed answer (section text is left out)
+SOURCE_FIELDS = ('country', 'vehicle_type', 'section', 'similarity_score')
+
+@app.on_event("startup")
+def load_embedding_index():
+    """
+    Prepare the database, then load (or build) the embedding index and warm
+    up the encoder in the background, so the port opens without waiting for
+    either; /ready reports when questions can be answered at full speed.
+    """
+    _startup["imports"] = time.perf_counter() - _process_started
+    started = time.perf_counter()
+    prepare_database()
+    _startup["database"] = time.perf_counter() - started
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+def _warm_up():
+    started = time.perf_counter()
+    try:
+        # A missing or stale index is built here, which loads the model and encodes the corpus
+        get_index()
+    except Exception as e:
+        print(f"⚠️ Embedding index warm-up failed, loading on first question instead: {e}")
+    _startup["index"] = time.perf_counter() - started
+    started = time.perf_counter()
+    try:
+        encode_texts(["warm-up"])  # Loads the model (or connects to the embedding sidecar)
+        get_reranker()  # Loads the cross-encoder when reranking is enabled
+    except Exception as e:
+        print(f"⚠️ Encoder warm-up failed, loading on first question instead: {e}")
+    _startup["encoder"] = time.perf_counter() - started
+    _startup["ready"] = time.perf_counter() - _process_started
+    _ready.set()
+    print("✅ Ready in {ready:.2f}s (imports {imports:.2f}s, database {database:.2f}s, index {index:.2f}s, "
+          "encoder {encoder:.2f}s)".format(**_startup))
+
 class Question(BaseModel):
     question: str
 
 @app.post("/ask")
-def ask_question(q: Question):
+async def ask_question(q: Question):
     """Answer a question about Sixt rental terms using Gemini AI"""
+    global _pending_requests
+    if _pending_requests >= MAX_PENDING_REQUESTS:
+        raise HTTPException(status_code=429, detail="Too many questions in progress. Please retry shortly.")
+    
+    _pending_requests += 1
     try:
-        result = answer_question(q.question)
+        result = await asyncio.wait_for(answer_question_async(q.question), timeout=REQUEST_TIMEOUT)
         return {
             "success": True,
             "question": result["question"],
             "answer": result["answer"],
-            "sources_count": len(result["sources"])
+            "sources_count": len(result["sources"]),
+            "context_tokens": result["context_tokens"]
         }
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Answering the question took too long. Please try again.")
     except Exception as e:
         return {
             "success": False,
             "error": str(e),
             "message": "Failed to process your question. Please try again."
         }
+    finally:
+        _pending_requests -= 1
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event; data is JSON so newlines in tokens are safe"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class PendingSlotResponse(StreamingResponse):
+    """
+    Holds an /ask/stream slot of _pending_requests until the response is
+    done. Released here rather than in the body generator, which never runs
+    when the client disconnects before the body starts.
+    """
+
+    async def __call__(self, scope, receive, send):
+        global _pending_requests
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _pending_requests -= 1
+
+@app.post("/ask/stream")
+async def ask_question_stream(q: Question):
+    """
+    Stream the answer as Server-Sent Events: `token` events with text chunks
+    as the LLM produces them, then one `sources` event and a final `done`.
+    """
+    global _pending_requests
+    if _pending_requests >= MAX_PENDING_REQUESTS:
+        raise HTTPException(status_code=429, detail="Too many questions in progress. Please retry shortly.")
+    
+    _pending_requests += 1
+    
+    async def events():
+        deadline = asyncio.get_running_loop().time() + REQUEST_TIMEOUT
+        stream = stream_answer_async(q.question)
+        try:
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    item = await asyncio.wait_for(stream.__anext__(), timeout=max(remaining, 0))
+                except StopAsyncIteration:
+                    break
+                if "token" in item:
+                    yield sse_event("token", {"text": item["token"]})
+                else:
+                    sources = [{key: source.get(key) for key in SOURCE_FIELDS} for source in item["sources"]]
+                    yield sse_event("sources", {"sources": sources, "sources_count": item["sources_count"],
+                                                "cached": item["cached"],
+                                                "context_tokens": item["context_tokens"]})
+            yield sse_event("done", {"success": True})
+        except asyncio.TimeoutError:
+            yield sse_event("error", {"message": "Answering the question took too long. Please try again."})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e), "message": "Failed to process your question. Please try again."})
+        finally:
+            await stream.aclose()
+    
+    return PendingSlotResponse(events(), media_type="text/event-stream",
+                               headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "Sixt Q&A API"}
+    health = {"status": "healthy", "service": "Sixt Q&A API", "pending_requests": _pending_requests,
+              "llm_provider": LLM_PROVIDER, "ready": _ready.is_set(),
+              "startup_seconds": {stage: round(seconds, 3) for stage, seconds in _startup.items()}}
+    batcher = get_batcher()
+    if batcher is not None:
+        health["query_batching"] = batcher.stats()
+    reranker = get_reranker() if _ready.is_set() else None  # Loaded by the warm-up
+    if reranker is not None:
+        health["reranking"] = reranker.stats()
+    return health
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 503 until the index is loaded and the encoder is warm"""
+    if not _ready.is_set():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"ready": True, "startup_seconds": round(_startup["ready"], 3)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: per-stage latency histograms and current load"""
+    gauges = {"sixt_pending_requests": ("Questions in progress or waiting for an LLM slot", _pending_requests)}
+    return PlainTextResponse(render_metrics(gauges), media_type=CONTENT_TYPE)
@@ -0,0 +1,168 @@
+"""
+Latency instrumentation for the question answering pipeline.
+
+Every request gets a StageTimer that adds up the time spent in each stage
+(index / DB load, query encoding, lexical search, similarity scoring,
+context building, answer cache lookup, LLM call). When the request is done
+the stage times and the total are observed into Prometheus histograms,
+served as text by `GET /metrics`. Code outside a request (batch runs,
+index builds) is not timed.
+
+With SIXT_TRACING=1 every request is also an OpenTelemetry span with one
+child span per stage. Only opentelemetry-api is needed here; spans are
+exported by whatever SDK the deployment configures (no-ops without one).
+
+Configuration (environment variables):
+    SIXT_TRACING  1 to emit OpenTelemetry spans (default 0)
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+TRACING = os.getenv('SIXT_TRACING', '0') == '1'
+
+# Bucket upper bounds in seconds, from an in-memory lookup to a slow LLM call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """A Prometheus histogram with one label: cumulative bucket counts, sum and count per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: Dict[str, list] = {}  # label value -> [count per bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def count(self, value: str) -> int:
+        with self._lock:
+            return self._series[value][-1] if value in self._series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+            lines.append(f'{self.name}_sum{{{label}}} {counts[-2]}')
+            lines.append(f'{self.name}_count{{{label}}} {counts[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('sixt_stage_duration_seconds',
+                          'Time spent per question in each pipeline stage (stage="total" is end to end)',
+                          'stage')
+
+_current: "contextvars.ContextVar[Optional[StageTimer]]" = contextvars.ContextVar('stage_timer', default=None)
+
+
+def _tracer():
+    if not TRACING:
+        return None
+    try:
+        from opentelemetry import trace  # Only imported when tracing is on
+    except ImportError:  # Tracing is optional
+        return None
+    return trace.get_tracer('sixt-qa')
+
+
+class StageTimer:
+    """
+    Stage durations of one request. A stage that runs several times (e.g.
+    the index lookup) is summed. The query batcher reports stages from its
+    own thread, hence the lock.
+    """
+
+    def __init__(self, name: str = 'sixt.request'):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        tracer = _tracer()
+        self._span = tracer.start_span(name) if tracer else None
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        span = None
+        if self._span is not None:
+            from opentelemetry import trace
+            span = _tracer().start_span(f"sixt.{name}", context=trace.set_span_in_context(self._span))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+            if span is not None:
+                span.end()
+
+    def run(self, fn: Callable, *args):
+        """Call fn(*args) with this timer as the current one, e.g. on a worker thread"""
+        token = _current.set(self)
+        try:
+            return fn(*args)
+        finally:
+            _current.reset(token)
+
+    def finish(self) -> Dict[str, float]:
+        """Record the total and observe every stage; returns the durations in seconds"""
+        with self._lock:
+            if 'total' in self.durations:
+                return dict(self.durations)
+            self.durations['total'] = time.perf_counter() - self.started
+            durations = dict(self.durations)
+        for stage, seconds in durations.items():
+            STAGE_SECONDS.observe(stage, seconds)
+        if self._span is not None:
+            for stage, seconds in durations.items():
+                self._span.set_attribute(f"sixt.{stage}_ms", round(seconds * 1000, 3))
+            self._span.end()
+        return durations
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current.get()
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a stage of the current request (does nothing outside of one)"""
+    timer = _current.get()
+    if timer is None:
+        yield
+    else:
+        with timer.stage(stage):
+            yield
+
+
+def render_metrics(gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+    """All metrics in Prometheus text format; gauges maps name -> (help, value)"""
+    lines = STAGE_SECONDS.render()
+    for name, (help_text, value) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return '\n'.join(lines) + '\n'
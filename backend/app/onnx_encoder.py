@@ -0,0 +1,226 @@
+"""
+Torch-free query encoder: the sentence transformer exported to ONNX and run
+with onnxruntime, tokenised with the `tokenizers` library, mean-pooled and
+normalised in NumPy. At serving time only onnxruntime, tokenizers and numpy
+are needed (no torch, no transformers).
+
+Export once (needs the full model stack; from the backend directory):
+    python -m app.onnx_encoder export --output models/all-MiniLM-L6-v2-onnx --int8
+
+then check it against the original model and serve with it:
+    python -m app.onnx_encoder validate --model-dir models/all-MiniLM-L6-v2-onnx
+    SIXT_ENCODER=onnx uvicorn app.main:app
+
+The export directory holds model.onnx (float32), model_int8.onnx (dynamic
+int8 weights, with --int8), tokenizer.json and encoder.json (settings).
+
+Configuration (environment variables):
+    SIXT_ONNX_MODEL_DIR  export directory (default backend/models/all-MiniLM-L6-v2-onnx)
+    SIXT_ONNX_INT8       1 to run model_int8.onnx (default 0)
+    SIXT_ONNX_THREADS    intra-op threads of the session (default 0: onnxruntime decides)
+"""
+
+import argparse
+import inspect
+import json
+import os
+import time
+import numpy as np
+from typing import Dict, List, Optional
+
+ONNX_MODEL_DIR = os.getenv('SIXT_ONNX_MODEL_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'all-MiniLM-L6-v2-onnx'))
+ONNX_INT8 = os.getenv('SIXT_ONNX_INT8', '0') == '1'
+ONNX_THREADS = int(os.getenv('SIXT_ONNX_THREADS', '0'))
+
+# Texts per forward pass, as in SentenceTransformer.encode(batch_size=64)
+BATCH_SIZE = 64
+
+# Sample texts for validation when no database is given
+VALIDATION_TEXTS = [
+    "What is the minimum age to rent a car in the USA?",
+    "Can I drive the rental car to Canada?",
+    "How much is the deposit for a truck?",
+    "Which payment methods are accepted?",
+    "The renter must be at least 21 years old and hold a valid driving licence for one year.",
+    "Cross-border rentals into Mexico are not permitted.",
+    "A young driver fee applies to drivers under 25.",
+    "VAT of 19% is included in all prices.",
+]
+
+
+class OnnxEncoder:
+    """Encodes texts like SentenceTransformer.encode(normalize_embeddings=True)"""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, int8: bool = ONNX_INT8, threads: int = ONNX_THREADS):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("SIXT_ENCODER=onnx needs onnxruntime and tokenizers "
+                              "(pip install onnxruntime tokenizers)") from e
+        with open(os.path.join(model_dir, 'encoder.json'), encoding='utf-8') as f:
+            self.config = json.load(f)
+        model_file = os.path.join(model_dir, 'model_int8.onnx' if int8 else 'model.onnx')
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"{model_file} not found; export it with python -m app.onnx_encoder export")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_file, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_file = model_file
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {'input_ids': np.array([e.ids for e in encodings], dtype=np.int64), 'attention_mask': mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        # Mean pooling over real tokens, then L2 normalisation
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalised float32 embeddings, one row per text"""
+        if not texts:
+            return np.zeros((0, self.config['dim']), dtype=np.float32)
+        # Similar lengths batched together keep padding small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), self.config['dim']), dtype=np.float32)
+        for start in range(0, len(order), BATCH_SIZE):
+            chunk = order[start:start + BATCH_SIZE]
+            out[chunk] = self._forward([texts[i] for i in chunk])
+        return out
+
+
+def export(model_name: str, output: str, int8: bool = False) -> None:
+    """Export the sentence transformer's encoder to ONNX (needs torch and sentence-transformers)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0]
+    modules = [type(m).__name__ for m in model]
+    pooling = model[1].get_config_dict() if len(model) > 1 else {}
+    # sentence-transformers < 6 has one flag per pooling mode
+    mode = pooling.get('pooling_mode', 'mean' if pooling.get('pooling_mode_mean_tokens') else None)
+    if modules[1:] not in (['Pooling', 'Normalize'], ['Pooling']) or mode != 'mean':
+        raise ValueError(f"Only mean-pooled models can be exported, got {modules}")
+    os.makedirs(output, exist_ok=True)
+
+    tokenizer = transformer.tokenizer
+    sample = tokenizer(["export sample", "a longer export sample sentence"], padding=True, return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    # The TorchScript exporter; newer torch defaults to the dynamo one, which needs onnxscript
+    options = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    transformer.auto_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(Encoder(transformer.auto_model), tuple(sample[n] for n in input_names),
+                          os.path.join(output, 'model.onnx'), input_names=input_names,
+                          output_names=['last_hidden_state'], dynamic_axes=dynamic,
+                          opset_version=17, **options)
+    tokenizer.backend_tokenizer.save(os.path.join(output, 'tokenizer.json'))
+    config = {'model': model_name, 'dim': int(model.encode(['dimension']).shape[1]),
+              'max_seq_length': model.max_seq_length, 'pooling': 'mean',
+              'pad_token': tokenizer.pad_token, 'pad_token_id': tokenizer.pad_token_id}
+    with open(os.path.join(output, 'encoder.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    print(f"✅ Exported {model_name} to {output}/model.onnx")
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(os.path.join(output, 'model.onnx'), os.path.join(output, 'model_int8.onnx'),
+                         weight_type=QuantType.QInt8)
+        print(f"✅ Quantised weights to int8: {output}/model_int8.onnx")
+
+
+def validate(model_dir: str, texts: List[str], model_name: Optional[str] = None, top_k: int = 5) -> Dict:
+    """
+    Compare ONNX embeddings (float32 and int8 when exported) with the original
+    model: cosine between both embeddings of every text, and whether each
+    text's top_k neighbours among the others stay the same.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    with open(os.path.join(model_dir, 'encoder.json'), encoding='utf-8') as f:
+        model_name = model_name or json.load(f)['model']
+    reference = SentenceTransformer(model_name, device='cpu').encode(
+        texts, batch_size=BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+    ref_neighbours = np.argsort(-(reference @ reference.T), axis=1)[:, 1:top_k + 1]
+
+    report = {}
+    for int8 in (False, True):
+        if int8 and not os.path.exists(os.path.join(model_dir, 'model_int8.onnx')):
+            continue
+        vectors = OnnxEncoder(model_dir, int8=int8).encode(texts)
+        cosine = np.sum(vectors * reference, axis=1)
+        neighbours = np.argsort(-(vectors @ vectors.T), axis=1)[:, 1:top_k + 1]
+        overlap = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(neighbours, ref_neighbours)])
+        report['int8' if int8 else 'float32'] = {
+            'texts': len(texts),
+            'min_cosine': float(cosine.min()),
+            'mean_cosine': float(cosine.mean()),
+            'max_abs_diff': float(np.abs(vectors - reference).max()),
+            f'neighbour_overlap@{top_k}': float(overlap),
+        }
+    return report
+
+
+def validation_texts(db_path: Optional[str], limit: int) -> List[str]:
+    """Questions plus section passages of the terms database (as embedded by the index)"""
+    texts = list(VALIDATION_TEXTS)
+    if db_path:
+        from .semantic_search import prepare_documents
+        from .chunking import embedding_text
+        texts += [embedding_text(doc) for doc in prepare_documents(db_path)[:limit]]
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and validate the ONNX query encoder")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_cmd = commands.add_parser('export', help="export the sentence transformer to ONNX")
+    export_cmd.add_argument('--model', default='all-MiniLM-L6-v2', help="model name or local path")
+    export_cmd.add_argument('--output', default=ONNX_MODEL_DIR)
+    export_cmd.add_argument('--int8', action='store_true', help="also write int8-quantised weights")
+    validate_cmd = commands.add_parser('validate', help="compare ONNX embeddings with the original model")
+    validate_cmd.add_argument('--model-dir', default=ONNX_MODEL_DIR)
+    validate_cmd.add_argument('--model', help="reference model (default: the exported one)")
+    validate_cmd.add_argument('--db', help="also validate on the passages of this terms database")
+    validate_cmd.add_argument('--limit', type=int, default=500, help="passages taken from --db")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        started = time.perf_counter()
+        export(args.model, args.output, args.int8)
+        print(f"   took {time.perf_counter() - started:.1f}s")
+    else:
+        report = validate(args.model_dir, validation_texts(args.db, args.limit), args.model)
+        print(json.dumps(report, indent=2))
+        for name, stats in report.items():
+            ok = stats['min_cosine'] >= (0.99 if name == 'int8' else 0.9999)
+            print(f"{'✅' if ok else '⚠️'} {name}: min cosine {stats['min_cosine']:.6f} against the original model")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,119 @@
-import google.generativeai as genai  # type: ignore
-from .db import get_db_connection, DB_PATH
-from .semantic_search import get_relevant_terms_semantic
+from .db import DB_PATH
+from .semantic_search import (get_relevant_terms_semantic, get_index, encode_query, encode_texts,
+                              resolve_filters, semantic_search, semantic_search_batch)
+from .lexical_search import lexical_search, reciprocal_rank_fusion
+from .vector_backends import backend_kind
+from .answer_cache import get_answer_cache
+from .llm_providers import get_provider
+from .context_builder import build_context
+from .metrics import StageTimer, timed
+from .reranker import RERANK_CANDIDATES, get_reranker
+import asyncio
 import os
-from typing import List, Dict, Optional
+import warnings
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
 
-# Configure Gemini
-# You'll need to set GOOGLE_API_KEY environment variable
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))  # type: ignore
+# Hybrid retrieval: lexical (FTS5 / BM25) + semantic, fused by reciprocal rank
+HYBRID_SEARCH = os.getenv('SIXT_HYBRID_SEARCH', '1') == '1'
+# Sections taken from each ranking into the fusion
+FUSION_DEPTH = 20
+# Lexical hits kept as the candidate set for vector scoring on large corpora
+LEXICAL_CANDIDATES = 300
+# Passage count from which vector scoring is restricted to lexical candidates,
+# as long as the exact backend serves the corpus (from SIXT_IVF_MIN_SIZE the
+# IVF index is already sublinear and scores the whole corpus instead)
+LEXICAL_PREFILTER_MIN = int(os.getenv('SIXT_LEXICAL_PREFILTER_MIN', '5000'))
 
-def get_relevant_terms(query: str, db_path: str = DB_PATH) -> List[Dict]:
-    """Retrieve relevant rental terms from database using semantic search"""
-    return get_relevant_terms_semantic(query, db_path)
+# Outbound LLM calls allowed in flight at once on the async path
+LLM_CONCURRENCY = int(os.getenv('SIXT_LLM_CONCURRENCY', '8'))
+_llm_semaphore: Optional[asyncio.Semaphore] = None
 
-def format_context_for_gemini(terms_data: List[Dict]) -> str:
-    """Format the retrieved terms data into a context string for Gemini, with most relevant section highlighted."""
-    if not terms_data:
-        return "No relevant rental terms found."
+# Dedicated pool for CPU-bound embedding / retrieval work, so it never
+# competes with the event loop or FastAPI's default threadpool
+RETRIEVAL_WORKERS = int(os.getenv('SIXT_RETRIEVAL_WORKERS', '4'))
+_retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix='retrieval')
+
+# Print the retrieved context and stage timings of every question (slow; off by default)
+DEBUG_LOG = os.getenv('SIXT_DEBUG_LOG', '0') == '1'
+
+# Answers containing this carry an error message and must never be cached
+ERROR_ANSWER_PREFIX = "Sorry, I encountered an error"
+
+def use_lexical_prefilter(db_path: str = DB_PATH) -> bool:
+    """Score only lexical candidates: corpora too large for a full exact scan but below the IVF size"""
+    n = len(get_index(db_path))
+    return n >= LEXICAL_PREFILTER_MIN and backend_kind(n) == 'exact'
+
+def get_relevant_terms(query: str, db_path: str = DB_PATH, country: Optional[str] = None,
+                       vehicle_type: Optional[str] = None, top_k: int = 5) -> List[Dict]:
+    """
+    Retrieve relevant rental terms from database using hybrid search: BM25
+    over the FTS5 index and semantic similarity, merged by reciprocal-rank
+    fusion. On large corpora the lexical hits are also the candidate set, so
+    only those passages are scored by the vector search.
+    """
+    if not HYBRID_SEARCH:
+        return get_relevant_terms_semantic(query, db_path, country=country, vehicle_type=vehicle_type,
+                                           top_k=top_k)
     
-    # Find the most relevant section (highest similarity_score)
-    most_relevant = max(terms_data, key=lambda x: x.get('similarity_score', 0))
+    country, vehicle_type = resolve_filters(query, db_path, country, vehicle_type)
     
-    # Build the targeted context
-    context_parts = []
+    with timed('lexical'):
+        lexical = lexical_search(query, db_path, limit=LEXICAL_CANDIDATES, country=country,
+                                 vehicle_type=vehicle_type)
+    candidates = None
+    if use_lexical_prefilter(db_path) and len(lexical) >= top_k:
+        candidates = [(r['row_id'], r['section']) for r in lexical]
     
-    # Add the most relevant section at the top
-    if most_relevant.get('section') and most_relevant.get('content'):
-        section_name = most_relevant['section'].replace('_', ' ').title()
-        context_parts.append(f"Most relevant section:\n{section_name}: {most_relevant['content']}\n")
-    else:
-        context_parts.append("Most relevant section: Not found\n")
-    
-    # Add the rest of the context for reference
-    context_parts.append("Full rental terms context (for reference):\n")
-    
-    # Group by country and vehicle type for the full context
-    grouped_data = {}
-    for result in terms_data:
-        key = (result['country'], result['vehicle_type'])
-        if key not in grouped_data:
-            grouped_data[key] = {
-                'country': result['country'],
-                'vehicle_type': result['vehicle_type'],
-                'sections': {}
-            }
-        grouped_data[key]['sections'][result['section']] = result['content']
-    
-    # Format the grouped data
-    for i, (key, data) in enumerate(grouped_data.items(), 1):
-        context_parts.append(f"Rental Terms Entry {i}:")
-        context_parts.append(f"Country: {data['country']}")
-        context_parts.append(f"Vehicle Type: {data['vehicle_type']}")
-        
-        for section_name, content in data['sections'].items():
-            if content and content.strip():
-                context_parts.append(f"{section_name.replace('_', ' ').title()}: {content}")
-        context_parts.append("")
-    
-    return "\n".join(context_parts)
-
-def generate_answer_with_gemini(question: str, context: str) -> str:
-    """Generate an answer using Google Gemini based on the question and context"""
-    try:
-        # Create the model
-        model = genai.GenerativeModel('gemini-1.5-flash')  # type: ignore
-        
-        # Create the prompt
-        prompt = f"""
+    semantic = semantic_search(query, db_path, top_k=FUSION_DEPTH, country=country,
+                               vehicle_type=vehicle_type, candidates=candidates)
+    
+    return reciprocal_rank_fusion([semantic, lexical[:FUSION_DEPTH]], top_k)
+
+def get_relevant_terms_batch(questions: List[str], db_path: str = DB_PATH,
+                             top_k: int = 5) -> Tuple[List[List[Dict]], np.ndarray]:
+    """
+    get_relevant_terms for many questions: they are encoded with one model
+    call and scored with one matrix product. Returns the results per question
+    and the question embeddings.
+    """
+    embeddings = encode_texts(questions)
+    filters = [resolve_filters(q, db_path) for q in questions]
+    if not HYBRID_SEARCH:
+        return semantic_search_batch(embeddings, filters, db_path, top_k=top_k), embeddings
+    
+    lexical = [lexical_search(q, db_path, limit=LEXICAL_CANDIDATES, country=country, vehicle_type=vehicle_type)
+               for q, (country, vehicle_type) in zip(questions, filters)]
+    prefilter = use_lexical_prefilter(db_path)
+    candidates = [[(r['row_id'], r['section']) for r in hits] if prefilter and len(hits) >= top_k else None
+                  for hits in lexical]
+    semantic = semantic_search_batch(embeddings, filters, db_path, top_k=FUSION_DEPTH, candidates=candidates)
+    return [reciprocal_rank_fusion([s, l[:FUSION_DEPTH]], top_k) for s, l in zip(semantic, lexical)], embeddings
+
+def find_terms(question: str, db_path: str = DB_PATH) -> List[Dict]:
+    """
+    The sections sent to the LLM: the hybrid search's top 5, or with
+    reranking (SIXT_RERANK=1) its top RERANK_CANDIDATES cut down to
+    RERANK_TOP_K by the cross-encoder.
+    """
+    reranker = get_reranker()
+    if reranker is None:
+        return get_relevant_terms(question, db_path)
+    return reranker.rerank(question, get_relevant_terms(question, db_path, top_k=RERANK_CANDIDATES))
+
+def find_terms_batch(questions: List[str], db_path: str = DB_PATH) -> Tuple[List[List[Dict]], np.ndarray]:
+    """find_terms for many questions at once (see get_relevant_terms_batch)"""
+    reranker = get_reranker()
+    if reranker is None:
+        return get_relevant_terms_batch(questions, db_path)
+    results, embeddings = get_relevant_terms_batch(questions, db_path, top_k=RERANK_CANDIDATES)
+    return [reranker.rerank(q, terms) for q, terms in zip(questions, results)], embeddings
+
+def build_prompt(question: str, context: str) -> str:
+    """Build the LLM prompt for a question and its retrieved context"""
+    return f"""
 You are a helpful assistant for Sixt car rental. Answer the customer's question based on the provided rental terms information.
 
 Rental Terms Information:
@@ -83,36 +131,228 @@ Instructions:
 7. Don't be overly cautious - if the information is there, provide it confidently
 
 Answer:"""
-        
-        # Generate response
-        response = model.generate_content(prompt)
-        return response.text
-        
+
+def error_answer(e: Exception) -> str:
+    return f"{ERROR_ANSWER_PREFIX} while processing your question. Please try again or contact customer service. Error: {str(e)}"
+
+def generate_answer(question: str, context: str, stream: bool = False) -> Union[str, Iterator[str]]:
+    """
+    Generate an answer with the configured LLM provider (see llm_providers)
+    based on the question and context. With stream=True an iterator of text
+    chunks is returned instead, yielding tokens as the model produces them.
+    """
+    if stream:
+        return _stream_answer(question, context)
+    try:
+        return get_provider().generate(build_prompt(question, context))
     except Exception as e:
-        return f"Sorry, I encountered an error while processing your question. Please try again or contact customer service. Error: {str(e)}"
+        return error_answer(e)
 
-def answer_question(question: str, db_path: str = DB_PATH) -> Dict:
-    """Main function to answer a question using RAG (Retrieval Augmented Generation)"""
-    # Step 1: Retrieve relevant terms
-    relevant_terms = get_relevant_terms(question, db_path)
-    
-    # Step 2: Format context
-    context = format_context_for_gemini(relevant_terms)
+def _stream_answer(question: str, context: str) -> Iterator[str]:
+    try:
+        for chunk in get_provider().stream(build_prompt(question, context)):
+            yield chunk
+    except Exception as e:
+        yield error_answer(e)
+
+async def generate_answer_async(question: str, context: str) -> str:
+    """Async variant of generate_answer; at most LLM_CONCURRENCY calls run at once"""
+    try:
+        async with _get_llm_semaphore():
+            return await get_provider().generate_async(build_prompt(question, context))
+    except Exception as e:
+        return error_answer(e)
+
+async def stream_llm_answer_async(question: str, context: str) -> AsyncIterator[str]:
+    """Async streaming variant; holds an LLM_CONCURRENCY slot until the stream ends"""
+    try:
+        async with _get_llm_semaphore():
+            async for chunk in get_provider().stream_async(build_prompt(question, context)):
+                yield chunk
+    except Exception as e:
+        yield error_answer(e)
+
+# Names from before the LLM provider abstraction and the context builder,
+# kept for existing callers. They use the configured provider
+# (SIXT_LLM_PROVIDER, Gemini by default) and the token-budgeted context.
+
+def format_context_for_gemini(terms_data: List[Dict], question: str = "") -> str:
+    """Deprecated: use context_builder.build_context (the question guides trimming)"""
+    warnings.warn("format_context_for_gemini is deprecated, use build_context", DeprecationWarning, stacklevel=2)
+    return build_context(question, terms_data)[0]
+
+def generate_answer_with_gemini(question: str, context: str, stream: bool = False) -> Union[str, Iterator[str]]:
+    """Deprecated: use generate_answer"""
+    warnings.warn("generate_answer_with_gemini is deprecated, use generate_answer", DeprecationWarning, stacklevel=2)
+    return generate_answer(question, context, stream)
+
+async def generate_answer_with_gemini_async(question: str, context: str) -> str:
+    """Deprecated: use generate_answer_async"""
+    warnings.warn("generate_answer_with_gemini_async is deprecated, use generate_answer_async",
+                  DeprecationWarning, stacklevel=2)
+    return await generate_answer_async(question, context)
+
+async def stream_answer_with_gemini_async(question: str, context: str) -> AsyncIterator[str]:
+    """Deprecated: use stream_llm_answer_async"""
+    warnings.warn("stream_answer_with_gemini_async is deprecated, use stream_llm_answer_async",
+                  DeprecationWarning, stacklevel=2)
+    async for chunk in stream_llm_answer_async(question, context):
+        yield chunk
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the running event loop (Python 3.9)
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _llm_semaphore
+
+def retrieve(question: str, db_path: str = DB_PATH) -> Dict:
+    """
+    Retrieval half of the pipeline (CPU bound): find relevant terms, build the
+    context and look the question up in the answer cache.
+    """
+    # Step 1: Retrieve relevant terms (and rerank them, if enabled)
+    relevant_terms = find_terms(question, db_path)
     
-    # Debug: Print the context being sent to LLM
-    print(f"DEBUG - Context being sent to LLM:")
-    print(f"Context length: {len(context)} characters")
-    print(f"Context preview: {context[:500]}...")
-    print(f"Number of relevant terms: {len(relevant_terms)}")
-    if relevant_terms:
-        print(f"Top similarity score: {relevant_terms[0].get('similarity_score', 'N/A')}")
+    # Step 2: Build the context within the token budget
+    with timed('context_build'):
+        context, context_stats = build_context(question, relevant_terms)
     
-    # Step 3: Generate answer with Gemini
-    answer = generate_answer_with_gemini(question, context)
+    if DEBUG_LOG:
+        print(f"DEBUG - Context being sent to LLM:")
+        print(f"Context length: {len(context)} characters, ~{context_stats['tokens']} tokens "
+              f"({context_stats['sections']} sections, {context_stats['trimmed']} trimmed)")
+        print(f"Context preview: {context[:500]}...")
+        print(f"Number of relevant terms: {len(relevant_terms)}")
+        if relevant_terms:
+            print(f"Top similarity score: {relevant_terms[0].get('similarity_score', 'N/A')}")
     
+    # Step 3: Reuse a cached answer for the same (or a near-identical) question
+    return _lookup_cached_answer(question, relevant_terms, context, context_stats, db_path)
+
+def retrieve_batch(questions: List[str], db_path: str = DB_PATH) -> List[Dict]:
+    """retrieve() for many questions at once, with batched embedding and scoring"""
+    results, embeddings = find_terms_batch(questions, db_path)
+    return [_lookup_cached_answer(question, terms, *build_context(question, terms), db_path, embedding)
+            for question, terms, embedding in zip(questions, results, embeddings)]
+
+def _lookup_cached_answer(question: str, relevant_terms: List[Dict], context: str, context_stats: Dict,
+                          db_path: str, query_embedding: Optional[np.ndarray] = None) -> Dict:
+    """Build the pipeline state, filled with the cached answer if there is one"""
+    state = {"question": question, "relevant_terms": relevant_terms, "context": context,
+             "context_tokens": context_stats["tokens"], "answer": None, "cached": None, "db_path": db_path}
+    cache = get_answer_cache(db_path)
+    if cache is not None:
+        state["corpus_version"] = get_index(db_path).fingerprint()
+        state["query_embedding"] = query_embedding if query_embedding is not None else encode_query(question)
+        with timed('cache_lookup'):
+            cached = cache.get(question, context, state["corpus_version"], state["query_embedding"])
+        if cached:
+            state["answer"], state["cached"] = cached
+    return state
+
+def store_answer(state: Dict, answer: str) -> None:
+    """Put a freshly generated answer into the cache (answers containing errors are skipped)"""
+    cache = get_answer_cache(state["db_path"])
+    if cache is not None and ERROR_ANSWER_PREFIX not in answer:
+        cache.put(state["question"], state["context"], state["corpus_version"], answer,
+                  state["query_embedding"])
+
+def build_response(state: Dict, answer: str) -> Dict:
+    context = state["context"]
     return {
-        "question": question,
+        "question": state["question"],
         "answer": answer,
-        "sources": relevant_terms,  # Include source data for transparency
+        "cached": state["cached"],  # 'exact', 'semantic' or None
+        "sources": state["relevant_terms"],  # Include source data for transparency
+        "context_tokens": state["context_tokens"],  # Estimated prompt context size
         "context_used": context[:500] + "..." if len(context) > 500 else context  # Truncated for response
-    } 
\ No newline at end of file
+    }
+
+def finish_timing(timer: StageTimer, response: Dict) -> Dict:
+    """Record the request's stage timings and add them to the response (in ms)"""
+    timings = {stage: round(seconds * 1000, 2) for stage, seconds in timer.finish().items()}
+    if DEBUG_LOG:
+        print(f"DEBUG - Stage timings (ms): {timings}")
+    response["timings_ms"] = timings
+    return response
+
+def answer_question(question: str, db_path: str = DB_PATH) -> Dict:
+    """Main function to answer a question using RAG (Retrieval Augmented Generation)"""
+    timer = StageTimer()
+    state = timer.run(retrieve, question, db_path)
+    
+    # Step 4: Generate answer with the LLM
+    answer = state["answer"]
+    if answer is None:
+        with timer.stage('llm'):
+            answer = generate_answer(question, state["context"])
+        store_answer(state, answer)
+    
+    return finish_timing(timer, build_response(state, answer))
+
+async def answer_question_async(question: str, db_path: str = DB_PATH) -> Dict:
+    """
+    Non-blocking answer_question: embedding and retrieval run on the dedicated
+    retrieval pool, the LLM is called through the provider's async client.
+    """
+    loop = asyncio.get_running_loop()
+    timer = StageTimer()
+    state = await loop.run_in_executor(_retrieval_pool, timer.run, retrieve, question, db_path)
+    
+    answer = state["answer"]
+    if answer is None:
+        with timer.stage('llm'):
+            answer = await generate_answer_async(question, state["context"])
+        await loop.run_in_executor(_retrieval_pool, store_answer, state, answer)
+    
+    return finish_timing(timer, build_response(state, answer))
+
+def answer_question_stream(question: str, db_path: str = DB_PATH) -> Dict:
+    """
+    Streaming answer_question: retrieval happens up front, and the returned
+    "answer" is an iterator of text chunks (a cached answer arrives as one chunk).
+    """
+    timer = StageTimer()
+    state = timer.run(retrieve, question, db_path)
+    
+    def chunks() -> Iterator[str]:
+        if state["answer"] is not None:
+            timer.finish()
+            yield state["answer"]
+            return
+        parts = []
+        with timer.stage('llm'):
+            for chunk in generate_answer(question, state["context"], stream=True):
+                parts.append(chunk)
+                yield chunk
+        store_answer(state, "".join(parts))
+        timer.finish()
+    
+    return build_response(state, chunks())
+
+async def stream_answer_async(question: str, db_path: str = DB_PATH) -> AsyncIterator[Dict]:
+    """
+    Async streaming pipeline used by /ask/stream. Yields {"token": text}
+    events while the LLM generates, then a final {"sources": ...} event.
+    """
+    loop = asyncio.get_running_loop()
+    timer = StageTimer()
+    state = await loop.run_in_executor(_retrieval_pool, timer.run, retrieve, question, db_path)
+    
+    if state["answer"] is not None:
+        yield {"token": state["answer"]}
+    else:
+        parts = []
+        llm_started = loop.time()
+        async for chunk in stream_llm_answer_async(question, state["context"]):
+            if not parts:
+                timer.add('llm_first_token', loop.time() - llm_started)
+            parts.append(chunk)
+            yield {"token": chunk}
+        timer.add('llm', loop.time() - llm_started)
+        await loop.run_in_executor(_retrieval_pool, store_answer, state, "".join(parts))
+    
+    response = finish_timing(timer, build_response(state, ""))
+    yield {"sources": response["sources"], "sources_count": len(response["sources"]),
+           "cached": response["cached"], "context_tokens": response["context_tokens"]}
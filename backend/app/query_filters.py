@@ -0,0 +1,64 @@
+"""
+Detect country and vehicle type filters mentioned in a question
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Other ways customers refer to a country, keyed by the lower-cased name stored in the database
+COUNTRY_ALIASES: Dict[str, List[str]] = {
+    'usa': ['united states', 'united states of america', 'america', 'u.s.a.', 'u.s.'],
+    'germany': ['german', 'deutschland'],
+    'united kingdom': ['uk', 'u.k.', 'great britain', 'britain', 'england'],
+    'netherlands': ['the netherlands', 'holland'],
+    'switzerland': ['swiss'],
+    'austria': ['austrian'],
+    'france': ['french'],
+    'spain': ['spanish'],
+    'italy': ['italian'],
+}
+
+# Aliases that are also ordinary English words, only matched when written in capitals
+CASE_SENSITIVE_ALIASES = {'usa': ['US']}
+
+VEHICLE_ALIASES: Dict[str, List[str]] = {
+    'truck': ['truck', 'trucks', 'lorry', 'lorries', 'van', 'vans', 'moving van'],
+    'passenger vehicle': ['passenger vehicle', 'passenger vehicles', 'passenger car', 'passenger cars'],
+}
+
+# A country right after one of these words is a destination ("drive to Canada"),
+# not the rental country, so it must not narrow the search
+_DESTINATION = re.compile(r'\b(?:to|into|through|across|via)\s+(?:the\s+)?$', re.IGNORECASE)
+
+
+def _find(pattern: str, question: str, flags: int = re.IGNORECASE) -> bool:
+    """True if the phrase occurs as whole words and not as a travel destination"""
+    for m in re.finditer(r'(?<![\w.])' + re.escape(pattern) + r'(?![\w])', question, flags):
+        if not _DESTINATION.search(question[:m.start()]):
+            return True
+    return False
+
+
+def _match(question: str, known: Iterable[str], aliases: Dict[str, List[str]],
+           case_sensitive: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
+    """Return the single known value mentioned in the question, or None if zero or several are"""
+    found = []
+    for value in known:
+        key = value.lower()
+        phrases = [value] + aliases.get(key, [])
+        if any(_find(p, question) for p in phrases) or \
+                any(_find(p, question, 0) for p in (case_sensitive or {}).get(key, [])):
+            found.append(value)
+    return found[0] if len(found) == 1 else None
+
+
+def extract_filters(question: str, countries: Iterable[str],
+                    vehicle_types: Iterable[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Detect which of the indexed countries and vehicle types a question is about.
+    Only values present in the index are returned, and a dimension is left
+    unfiltered (None) when nothing or more than one value is mentioned.
+    """
+    country = _match(question, countries, COUNTRY_ALIASES, CASE_SENSITIVE_ALIASES)
+    vehicle_type = _match(question, vehicle_types, VEHICLE_ALIASES)
+    return country, vehicle_type
@@ -0,0 +1,180 @@
+"""
+Optional second retrieval stage: a cross-encoder reranks a wider candidate
+set from the hybrid (bi-encoder + BM25) search, so fewer but better
+sections are sent to the LLM.
+
+A cross-encoder reads question and passage together and is much more
+accurate than comparing embeddings, but costs a model pass per pair. Each
+question therefore gets a time budget. Candidates are scored in batches in
+their first-stage order, each batch only as large as the time left allows
+(from a running estimate of the cost per pair, measured when the model is
+loaded). Candidates the budget doesn't reach keep their first-stage order
+after the reranked ones, so with no time at all the result is the
+first-stage ranking. Scores are cached per (question, passage) pair, so
+repeated questions cost nothing.
+
+Configuration (environment variables):
+    SIXT_RERANK             1 to rerank (default 0)
+    SIXT_RERANK_MODEL       cross-encoder name or local path (default cross-encoder/ms-marco-MiniLM-L-6-v2)
+    SIXT_RERANK_CANDIDATES  sections retrieved for reranking (default 20)
+    SIXT_RERANK_TOP_K       sections kept after reranking and sent to the LLM (default 3)
+    SIXT_RERANK_BUDGET_MS   reranking time budget per question (default 150)
+    SIXT_RERANK_BATCH       pairs scored per model call (default 8)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .chunking import section_title
+from .metrics import timed
+
+RERANK_ENABLED = os.getenv('SIXT_RERANK', '0') == '1'
+RERANK_MODEL = os.getenv('SIXT_RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+RERANK_CANDIDATES = int(os.getenv('SIXT_RERANK_CANDIDATES', '20'))
+RERANK_TOP_K = int(os.getenv('SIXT_RERANK_TOP_K', '3'))
+RERANK_BUDGET_MS = float(os.getenv('SIXT_RERANK_BUDGET_MS', '150'))
+RERANK_BATCH = int(os.getenv('SIXT_RERANK_BATCH', '8'))
+
+# Cached (question, passage) scores
+SCORE_CACHE_SIZE = 10000
+
+# Tokens per (question, passage) pair; the passage is cut beyond that
+MAX_PAIR_TOKENS = 256
+
+# Weight of the latest batch in the running cost-per-pair estimate
+COST_SMOOTHING = 0.2
+
+
+def passage_text(result: Dict) -> str:
+    """What the cross-encoder reads of a section: the matching passage if known, else the whole section"""
+    text = result.get('passage') or result['content']
+    return f"{result['country']} - {result['vehicle_type']} - {section_title(result['section'])}: {text}"
+
+
+class Reranker:
+    """Cross-encoder reranking under a time budget, with an LRU cache of pair scores"""
+
+    def __init__(self, model_name: str = RERANK_MODEL, budget_ms: float = RERANK_BUDGET_MS,
+                 batch_size: int = RERANK_BATCH):
+        # Imported on first use, like the sentence transformer
+        from sentence_transformers import CrossEncoder
+        print(f"🤖 Loading cross-encoder {model_name}...")
+        self.model = CrossEncoder(model_name, device='cpu', max_length=MAX_PAIR_TOKENS)
+        print("✅ Cross-encoder loaded")
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._questions = 0
+        self._over_budget = 0
+        self._pairs_scored = 0
+        self._cache_hits = 0
+        # A full batch of maximum length pairs, to load the weights and take a first cost estimate
+        started = time.perf_counter()
+        self._predict([("warm-up", "passage " * MAX_PAIR_TOKENS)] * batch_size)
+        self._pair_seconds = (time.perf_counter() - started) / batch_size
+
+    def _predict(self, pairs: List[Tuple[str, str]]):
+        return self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+
+    def _cached_scores(self, question: str, texts: List[str]) -> List[Optional[float]]:
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for text in texts:
+                score = self._cache.get((question, text))
+                if score is not None:
+                    self._cache.move_to_end((question, text))
+                scores.append(score)
+        return scores
+
+    def _store(self, question: str, texts: List[str], scores) -> None:
+        with self._lock:
+            for text, score in zip(texts, scores):
+                self._cache[(question, text)] = float(score)
+            while len(self._cache) > SCORE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def rerank(self, question: str, results: List[Dict], top_k: int = RERANK_TOP_K) -> List[Dict]:
+        """
+        The top_k of results (in first-stage order) after reranking. Reranked
+        sections get a 'rerank_score'; the ones the budget didn't reach keep
+        their first-stage order after them.
+        """
+        started = time.perf_counter()
+        deadline = started + self.budget_ms / 1000
+        texts = [passage_text(r) for r in results]
+        scores = self._cached_scores(question, texts)
+        hits = sum(s is not None for s in scores)
+
+        # Score the missing pairs best candidates first while the budget lasts
+        missing = [i for i, s in enumerate(scores) if s is None]
+        scored = 0
+        with timed('rerank'):
+            while scored < len(missing):
+                fits = int((deadline - time.perf_counter()) / self._pair_seconds)
+                if fits < 1:
+                    break
+                batch = missing[scored:scored + min(fits, self.batch_size)]
+                batch_started = time.perf_counter()
+                batch_scores = self._predict([(question, texts[i]) for i in batch])
+                self._pair_seconds += COST_SMOOTHING * (
+                    (time.perf_counter() - batch_started) / len(batch) - self._pair_seconds)
+                scored += len(batch)
+                self._store(question, [texts[i] for i in batch], batch_scores)
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+
+        # Only the scored prefix is reordered: a cached score further down
+        # never jumps over candidates the budget didn't reach
+        prefix = 0
+        while prefix < len(scores) and scores[prefix] is not None:
+            prefix += 1
+        head = sorted(range(prefix), key=lambda i: scores[i], reverse=True)
+        ranked = []
+        for i in head + list(range(prefix, len(results))):
+            result = dict(results[i])
+            if i < prefix:
+                result['rerank_score'] = scores[i]
+            ranked.append(result)
+
+        with self._lock:
+            self._questions += 1
+            self._over_budget += prefix < len(results)
+            self._pairs_scored += scored
+            self._cache_hits += hits
+        return ranked[:top_k]
+
+    def stats(self) -> Dict:
+        """Questions reranked, how many ran out of budget, and pairs scored versus served from the cache"""
+        with self._lock:
+            return {
+                "questions": self._questions,
+                "over_budget": self._over_budget,
+                "pairs_scored": self._pairs_scored,
+                "cache_hits": self._cache_hits,
+                "budget_ms": self.budget_ms,
+                "ms_per_pair": round(self._pair_seconds * 1000, 3),
+            }
+
+
+_reranker: Optional[Reranker] = None
+_reranker_failed = False
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """The shared reranker, or None when reranking is disabled (or its model can't be loaded)"""
+    global _reranker, _reranker_failed
+    if not RERANK_ENABLED or _reranker_failed:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None and not _reranker_failed:
+                try:
+                    _reranker = Reranker()
+                except Exception as e:
+                    print(f"⚠️ Could not load the cross-encoder, answering without reranking: {e}")
+                    _reranker_failed = True
+    return _reranker
@@ -1,12 +1,34 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup, Tag
+import argparse
+import hashlib
+import random
 import sqlite3
+import threading
 import time
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from .db import ensure_fts, ensure_generation, ensure_unique_terms, TERMS_COLUMNS
+from .terms_writer import TermsWriter, DEFAULT_BATCH_SIZE
+from .terms_parser import iter_sections
 
 BASE_URL = "https://www.sixt.com/php/terms/view"
 
+# Full crawl defaults
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 4.0  # requests per second per host
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds, doubled on every retry
+REQUEST_TIMEOUT = 30
+
+# Hardcode ctype_map since it uses JS variables. Two codes can map to one
+# vehicle type; rows are stored per vehicle type, so a crawl fetches only the
+# first code listed here for each one
+CTYPE_MAP = {'EPP': 'Passenger vehicle', 'EPL': 'Truck', 'IP': 'Passenger vehicle', 'IL': 'Truck'}
+
 SECTION_MAP = {
     'General Rental Information': 'rental_information',
     'Tariff information': 'payment_information',
@@ -18,11 +40,7 @@ SECTION_MAP = {
     # You can add more mappings if you want to capture more sections
 }
 
-ALL_COLUMNS = [
-    'country', 'vehicle_type',
-    'rental_information', 'payment_information', 'protection_conditions',
-    'authorized_driving_areas', 'extras', 'other_charges_and_taxes', 'vat'
-]
+ALL_COLUMNS = TERMS_COLUMNS
 
 def init_db(db_path='sixt_terms.db'):
     conn = sqlite3.connect(db_path)
@@ -41,32 +59,121 @@ def init_db(db_path='sixt_terms.db'):
             vat TEXT
         )
     ''')
+    # HTTP validators and body hash of the last fetch of every page, for incremental re-scrapes.
+    # Keyed by vehicle code, since each code is its own page; state from before
+    # the code was recorded is dropped, so the next crawl fetches every page once
+    columns = [r[1] for r in c.execute("PRAGMA table_info(scrape_state)")]
+    if columns and 'vehicle_code' not in columns:
+        c.execute("DROP TABLE scrape_state")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_state (
+            country TEXT,
+            vehicle_code TEXT,
+            vehicle_type TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            checked_at REAL,
+            changed_at REAL,
+            PRIMARY KEY (country, vehicle_code)
+        )
+    ''')
     conn.commit()
+    ensure_fts(conn)  # Full-text index is kept in sync by triggers from here on
+    ensure_generation(conn)
+    ensure_unique_terms(conn)
     return conn
 
-def save_terms_row(conn, row):
-    c = conn.cursor()
-    placeholders = ','.join(['?'] * len(ALL_COLUMNS))
-    c.execute(f'''
-        INSERT INTO rental_terms ({','.join(ALL_COLUMNS)})
-        VALUES ({placeholders})
-    ''', [row.get(col) for col in ALL_COLUMNS])
-    conn.commit()
+def load_scrape_state(conn):
+    """{(country, vehicle_code): {'etag', 'last_modified', 'content_hash'}} from the last crawl"""
+    rows = conn.execute("SELECT country, vehicle_code, etag, last_modified, content_hash FROM scrape_state")
+    return {(r[0], r[1]): {'etag': r[2], 'last_modified': r[3], 'content_hash': r[4]} for r in rows}
+
+class TokenBucket:
+    """Thread-safe token bucket: on average `rate` requests per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
-def get_countries_and_vehicle_types():
-    resp = requests.get(BASE_URL, params={
+class HostRateLimiter:
+    """One token bucket per host, so a crawl never exceeds `rate` requests/s to any server"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+def make_session(pool_size=DEFAULT_WORKERS):
+    """HTTP session with a connection pool large enough for every crawl worker"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch(session, url, params, limiter=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, headers=None):
+    """
+    GET with per-host rate limiting and retries with exponential backoff (plus
+    jitter) on connection errors, 429 and 5xx. Other responses are returned as is.
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire(url)
+        try:
+            resp = session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+            if resp.status_code != 429 and resp.status_code < 500:
+                return resp
+            error = f"HTTP {resp.status_code}"
+            retry_after = resp.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdigit() else backoff * 2 ** attempt
+        except requests.RequestException as e:
+            error = str(e)
+            delay = backoff * 2 ** attempt
+        if attempt < retries:
+            time.sleep(delay + random.uniform(0, backoff))
+    raise RuntimeError(f"Giving up after {retries + 1} attempts: {error}")
+
+def terms_params(country_code, vehicle_code):
+    return {
         'language': 'en_US',
-        'liso': 'US',
-        'rtar': '000',
+        'liso': country_code,
+        'rtar': vehicle_code,
         'view': 'EPP',
         'tlang': 'en_GB',
         'style': 'typo3'
-    })
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    }
+
+def parse_countries_page(html):
+    """Return ([(code, name)], avail_ctype) from the terms landing page"""
+    soup = BeautifulSoup(html, 'html.parser')
     # Country codes
     country_select = soup.find('select', {'name': 'select_country'})
     countries = []
-    usa_code = None
     if isinstance(country_select, Tag):
         for opt in country_select.find_all('option'):
             if not isinstance(opt, Tag):
@@ -75,8 +182,6 @@ def get_countries_and_vehicle_types():
             name = opt.text.strip()
             if code:
                 countries.append((code, name))
-                if name.lower() == 'usa' or (isinstance(code, str) and code.startswith('US')):
-                    usa_code = code
     # Parse avail_ctype from JS
     avail_ctype = {}
     for script in soup.find_all('script'):
@@ -84,53 +189,129 @@ def get_countries_and_vehicle_types():
             m = re.search(r'var avail_ctype\s*=\s*(\{.*?\});', script.text, re.DOTALL)
             if m:
                 avail_ctype = json.loads(m.group(1).replace("'", '"'))
-    # Hardcode ctype_map since it uses JS variables
-    ctype_map = {'EPP': 'Passenger vehicle', 'EPL': 'Truck', 'IP': 'Passenger vehicle', 'IL': 'Truck'}
+    return countries, avail_ctype
+
+def get_countries_and_vehicle_types(session=None, base_url=BASE_URL):
+    resp = (session or requests).get(base_url, params=terms_params('US', '000'), timeout=REQUEST_TIMEOUT)
+    countries, avail_ctype = parse_countries_page(resp.text)
+    usa_code = None
+    for code, name in countries:
+        if name.lower() == 'usa' or (isinstance(code, str) and code.startswith('US')):
+            usa_code = code
     # Only get vehicle types for USA
     vehicle_types = []
     if usa_code and usa_code in avail_ctype:
         for vcode in avail_ctype[usa_code]:
-            vname = ctype_map.get(vcode, vcode)
+            vname = CTYPE_MAP.get(vcode, vcode)
             vehicle_types.append((vcode, vname))
     # Only return USA
     usa = [c for c in countries if c[0] == usa_code]
     return usa, vehicle_types
 
-def scrape_terms_for(conn, country_code, country_name, vehicle_code, vehicle_name):
-    params = {
-        'language': 'en_US',
-        'liso': country_code,
-        'rtar': vehicle_code,
-        'view': 'EPP',
-        'tlang': 'en_GB',
-        'style': 'typo3'
+def crawl_codes(vehicle_codes):
+    """The vehicle codes to fetch: one per vehicle type, preferring the one listed first in CTYPE_MAP"""
+    order = {vcode: i for i, vcode in enumerate(CTYPE_MAP)}
+    chosen = {}
+    for vcode in sorted(vehicle_codes, key=lambda v: order.get(v, len(order))):
+        chosen.setdefault(CTYPE_MAP.get(vcode, vcode), vcode)
+    return [vcode for vcode in vehicle_codes if vcode in chosen.values()]
+
+def get_crawl_targets(session=None, base_url=BASE_URL):
+    """(country_code, country_name, vehicle_code, vehicle_name) for every vehicle type listed in avail_ctype"""
+    resp = (session or requests).get(base_url, params=terms_params('US', '000'), timeout=REQUEST_TIMEOUT)
+    countries, avail_ctype = parse_countries_page(resp.text)
+    targets = []
+    for code, name in countries:
+        for vcode in crawl_codes(avail_ctype.get(code, [])):
+            targets.append((code, name, vcode, CTYPE_MAP.get(vcode, vcode)))
+    return targets
+
+def parse_terms_page(html, country_name, vehicle_name):
+    """
+    Extract the SECTION_MAP sections of a terms page into a rental_terms row.
+    `html` is the page or an iterable of decoded chunks; sections are read
+    by the streaming extractor without building a document tree.
+    """
+    row = {'country': country_name, 'vehicle_type': vehicle_name}
+    for column, text in iter_sections(html, SECTION_MAP):
+        row[column] = text
+    return row
+
+def has_terms(row):
+    return any(row.get(col) for col in ALL_COLUMNS[2:])
+
+def fetch_terms(session, target, state=None, limiter=None, base_url=BASE_URL):
+    """
+    Conditionally fetch and parse one terms page.
+
+    Sends If-None-Match / If-Modified-Since from the previous crawl's state and
+    skips parsing when the server answers 304 or the body hash is unchanged.
+    Returns a result dict whose 'status' is 'not_modified', 'unchanged' or 'fetched'.
+    """
+    country_code, country_name, vehicle_code, vehicle_name = target
+    state = state or {}
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+
+    resp = fetch(session, base_url, terms_params(country_code, vehicle_code), limiter, headers=headers)
+    result = {
+        'country': country_name,
+        'vehicle_code': vehicle_code,
+        'vehicle_type': vehicle_name,
+        'etag': resp.headers.get('ETag', state.get('etag')),
+        'last_modified': resp.headers.get('Last-Modified', state.get('last_modified')),
+        'content_hash': state.get('content_hash'),
+        'bytes': len(resp.content),
+        'row': None,
     }
-    resp = requests.get(BASE_URL, params=params)
+    if resp.status_code == 304:
+        result['status'] = 'not_modified'
+        return result
     if resp.status_code != 200:
-        print(f"Failed to fetch {country_name} - {vehicle_name}: HTTP {resp.status_code}")
+        raise RuntimeError(f"HTTP {resp.status_code}")
+
+    result['content_hash'] = hashlib.sha256(resp.content).hexdigest()
+    if result['content_hash'] == state.get('content_hash'):
+        result['status'] = 'unchanged'
+        return result
+    result['status'] = 'fetched'
+    result['row'] = parse_terms_page(resp.text, country_name, vehicle_name)
+    return result
+
+def apply_fetch_result(writer, result):
+    """
+    Queue one fetch result: the row if it has content (upserted, and added to
+    the change set if it differs) and the page's validators.
+    """
+    if result['row'] is not None and has_terms(result['row']):
+        writer.add(result['row'])
+    writer.add_state(result)
+
+def write_change_set(changes, path):
+    """Write the change set for downstream consumers (index refresh, cache invalidation)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'generated_at': time.time(), 'changes': changes}, f, indent=2)
+
+def scrape_terms_for(conn, country_code, country_name, vehicle_code, vehicle_name,
+                     session=None, base_url=BASE_URL, changes=None):
+    session = session or requests.Session()
+    state = load_scrape_state(conn).get((country_name, vehicle_code))
+    target = (country_code, country_name, vehicle_code, vehicle_name)
+    try:
+        result = fetch_terms(session, target, state, base_url=base_url)
+    except RuntimeError as e:
+        print(f"Failed to fetch {country_name} - {vehicle_name}: {e}")
         return
-    soup = BeautifulSoup(resp.text, 'html.parser')
-    row = {'country': country_name, 'vehicle_type': vehicle_name}
-    current_col = None
-    content_acc = []
-    for el in soup.find_all(['h2', 'h3', 'p', 'ul', 'ol']):
-        if getattr(el, 'name', None) == 'h2':
-            section_title = el.get_text(strip=True)
-            print(f"Found section: '{section_title}'")  # Debug print
-            if current_col:
-                row[current_col] = '\n'.join(content_acc).strip()
-            current_col = SECTION_MAP.get(section_title)
-            content_acc = []
-        elif current_col:
-            content_acc.append(el.get_text(" ", strip=True))
-    if current_col:
-        row[current_col] = '\n'.join(content_acc).strip()
-    # Only save if at least one section has data
-    print(row)  # Debug print
-    if any(row.get(col) for col in ALL_COLUMNS[2:]):
-        save_terms_row(conn, row)
-
-def scrape_all_terms(conn):
+    if result['row'] is not None:
+        print(result['row'])  # Debug print
+    with TermsWriter(conn, changes=changes) as writer:
+        apply_fetch_result(writer, result)
+    print(f"{country_name} - {vehicle_name}: {result['status']}, {dict(writer.counts)}")
+
+def scrape_all_terms(conn, changes=None):
     countries, vehicle_types = get_countries_and_vehicle_types()
     # Only process USA
     if not countries:
@@ -144,13 +325,81 @@ def scrape_all_terms(conn):
     vehicle_code, vehicle_name = vehicle_types[0]
     print(f"Scraping {country_name} - {vehicle_name}...")
     try:
-        scrape_terms_for(conn, country_code, country_name, vehicle_code, vehicle_name)
+        scrape_terms_for(conn, country_code, country_name, vehicle_code, vehicle_name, changes=changes)
         time.sleep(0.5)
     except Exception as e:
         print(f"Failed for {country_name} - {vehicle_name}: {e}")
 
+def crawl_all_terms(conn, base_url=BASE_URL, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+                    targets=None, changes=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Full crawl: every country x vehicle type, fetched and parsed by a bounded
+    thread pool over one pooled session, rate limited per host. Pages are
+    requested conditionally and only re-parsed when their content changed.
+    Rows are written from the calling thread as pages complete, in batched
+    transactions, and added / updated rows are appended to `changes`.
+    Returns crawl stats.
+    """
+    session = make_session(workers)
+    limiter = HostRateLimiter(rate)
+    if targets is None:
+        targets = get_crawl_targets(session, base_url)
+    states = load_scrape_state(conn)
+    writer = TermsWriter(conn, batch_size, changes)
+    print(f"Crawling {len(targets)} country / vehicle type combinations with {workers} workers...")
+
+    stats = {'targets': len(targets), 'added': 0, 'updated': 0, 'unchanged': 0, 'not_modified': 0,
+             'empty': 0, 'failed': 0, 'bytes': 0}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool, writer:
+        futures = {pool.submit(fetch_terms, session, t, states.get((t[1], t[2])), limiter, base_url): t
+                   for t in targets}
+        for future in as_completed(futures):
+            _, country_name, _, vehicle_name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"Failed for {country_name} - {vehicle_name}: {e}")
+                continue
+            stats['bytes'] += result['bytes']
+            if result['status'] == 'not_modified':
+                stats['not_modified'] += 1
+            elif result['status'] == 'unchanged':
+                stats['unchanged'] += 1
+            elif not has_terms(result['row']):
+                stats['empty'] += 1
+            apply_fetch_result(writer, result)
+    for change in ('added', 'updated', 'unchanged'):
+        stats[change] += writer.counts[change]
+    stats['seconds'] = time.perf_counter() - started
+    stats['pages_per_second'] = (stats['targets'] - stats['failed']) / stats['seconds'] if stats['seconds'] else 0.0
+    session.close()
+    print(f"Crawl finished: {stats['added']} added, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+          f"{stats['not_modified']} not modified, {stats['empty']} empty, {stats['failed']} failed "
+          f"in {stats['seconds']:.1f}s ({stats['pages_per_second']:.2f} pages/s, "
+          f"{stats['bytes'] / 1024:.0f} KiB)")
+    return stats
+
 if __name__ == "__main__":
-    conn = init_db()
-    scrape_all_terms(conn)
-    print("Scraping complete. Data saved to sixt_terms.db.")
-    conn.close() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Sixt rental terms into sixt_terms.db")
+    parser.add_argument('--all', action='store_true',
+                        help="crawl every country and vehicle type instead of only USA")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="max requests per second per host")
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--db', default='sixt_terms.db')
+    parser.add_argument('--changes', help="write the set of added / updated rows to this JSON file")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per write transaction")
+    args = parser.parse_args()
+
+    conn = init_db(args.db)
+    changes = []
+    if args.all:
+        crawl_all_terms(conn, args.base_url, args.workers, args.rate, changes=changes, batch_size=args.batch_size)
+    else:
+        scrape_all_terms(conn, changes=changes)
+    if args.changes:
+        write_change_set(changes, args.changes)
+    print(f"Scraping complete. Data saved to {args.db} ({len(changes)} rows changed).")
+    conn.close()
@@ -2,124 +2,465 @@
 Semantic search functionality using sentence transformers
 """
 
-from sentence_transformers import SentenceTransformer, util
-import torch
-from typing import List, Dict, Tuple
-from .db import get_db_connection, DB_PATH
+import numpy as np
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple
+from .db import get_read_connection, db_generation, DB_PATH
+from .embedding_index import EmbeddingIndex, index_path_for, index_file_lock
+from .vector_backends import VECTOR_PRECISION
+from .chunking import SECTIONS, Passage, chunk_row, embedding_text
+from .query_filters import extract_filters
+from .metrics import current_timer, timed
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# In-process encoder: `torch` (SentenceTransformer) or `onnx` (exported
+# model on onnxruntime, no torch import; see app.onnx_encoder)
+ENCODER = os.getenv('SIXT_ENCODER', 'torch')
+
+def index_model_name() -> str:
+    """
+    Model recorded in the embedding index. The ONNX export (and its int8
+    weights) embeds slightly differently from torch, so its vectors are kept
+    apart and an index built by another encoder is rebuilt, not reused.
+    """
+    if ENCODER == 'onnx':
+        from .onnx_encoder import ONNX_INT8
+        return f"{MODEL_NAME}+onnx-{'int8' if ONNX_INT8 else 'float32'}"
+    return MODEL_NAME
+
+INDEX_MODEL = index_model_name()
+
+# Only the columns chunk_row() reads; ordered so every (country, vehicle_type)
+# partition is a contiguous block of the index
+DOCUMENTS_SQL = (f"SELECT id, country, vehicle_type, {', '.join(SECTIONS)} FROM rental_terms "
+                 "ORDER BY country, vehicle_type, id")
+
+# Passages fetched per requested section before collapsing hits into sections
+PASSAGE_FANOUT = 4
+
+# Recently encoded queries (repeated questions skip the model entirely)
+QUERY_CACHE_SIZE = 1024
+
+# Micro-batching of concurrent query searches
+QUERY_BATCHING = os.getenv('SIXT_QUERY_BATCHING', '1') == '1'
+BATCH_MAX_SIZE = int(os.getenv('SIXT_BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.getenv('SIXT_BATCH_MAX_WAIT_MS', '5'))
+
+# Multi-worker deployments: map the index matrix read-only from disk so all
+# workers share one copy, and/or encode through the embedding sidecar
+# (app.embedding_server) so workers never load the model themselves
+SHARED_INDEX = os.getenv('SIXT_SHARED_INDEX', '0') == '1'
+# Quantised search only reads the float32 vectors of its rescoring
+# candidates, so the matrix stays memory-mapped instead of in the heap
+MAP_INDEX = SHARED_INDEX or VECTOR_PRECISION != 'float32'
+EMBEDDING_SOCKET = os.getenv('SIXT_EMBEDDING_SOCKET')
 
 # Global model instance (load once, reuse)
 _model = None
+_onnx_encoder = None
+_remote_encoder = None
+
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+# Embedding indexes per database path, guarded by a lock so concurrent
+# requests don't rebuild the same index twice; an index is replaced, never
+# modified, once published here
+_indexes: Dict[str, EmbeddingIndex] = {}
+_index_lock = threading.Lock()
 
 def get_model():
     """Get or create the sentence transformer model"""
     global _model
     if _model is None:
+        # Imported on first use so sidecar clients never load torch
+        from sentence_transformers import SentenceTransformer
         print("🤖 Loading sentence transformer model...")
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
+        _model = SentenceTransformer(MODEL_NAME)
         print("✅ Model loaded successfully")
     return _model
 
-def prepare_documents(db_path: str = DB_PATH) -> List[Tuple[str, str, str, str, str]]:
+def get_onnx_encoder():
+    """Get or create the ONNX encoder"""
+    global _onnx_encoder
+    if _onnx_encoder is None:
+        from .onnx_encoder import OnnxEncoder
+        print("🤖 Loading ONNX encoder...")
+        _onnx_encoder = OnnxEncoder()
+        print(f"✅ ONNX encoder loaded ({os.path.basename(_onnx_encoder.model_file)})")
+    return _onnx_encoder
+
+def load_encoder() -> None:
+    """Load the configured in-process encoder up front"""
+    if ENCODER == 'onnx':
+        get_onnx_encoder()
+    elif ENCODER == 'torch':
+        get_model()
+    else:
+        raise ValueError(f"Unknown encoder: {ENCODER}")
+
+def encode_texts_locally(texts: List[str]) -> np.ndarray:
+    """Encode texts with the in-process model (SIXT_ENCODER)"""
+    if ENCODER == 'onnx':
+        return get_onnx_encoder().encode(texts)
+    model = get_model()
+    return model.encode(texts, batch_size=64, convert_to_numpy=True,
+                        normalize_embeddings=True).astype(np.float32)
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """Encode texts into L2-normalised float32 embeddings (one row per text)"""
+    global _remote_encoder
+    if EMBEDDING_SOCKET:
+        if _remote_encoder is None:
+            from .embedding_server import RemoteEncoder
+            _remote_encoder = RemoteEncoder(EMBEDDING_SOCKET)
+        return _remote_encoder.encode(texts)
+    return encode_texts_locally(texts)
+
+def encode_queries(queries: List[str]) -> np.ndarray:
+    """
+    Encode queries with one model call, reusing recently seen queries.
+    Returned rows are shared with the cache and must not be modified.
+    """
+    vectors: List[Optional[np.ndarray]] = [None] * len(queries)
+    with _query_cache_lock:
+        for i, query in enumerate(queries):
+            if query in _query_cache:
+                _query_cache.move_to_end(query)
+                vectors[i] = _query_cache[query]
+    
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        with timed('query_encode'):
+            encoded = dict(zip(missing, encode_texts(missing)))
+        with _query_cache_lock:
+            for query, vector in encoded.items():
+                _query_cache[query] = vector
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+        vectors = [v if v is not None else encoded[q] for q, v in zip(queries, vectors)]
+    
+    return np.vstack(vectors)
+
+def encode_query(query: str) -> np.ndarray:
+    """Encode a single query into an L2-normalised float32 vector (cached, do not modify the result)"""
+    return encode_queries([query])[0]
+
+class QueryBatcher:
+    """
+    Micro-batcher for query searches. Requests arriving within max_wait_ms of
+    the first one (up to max_batch_size) are encoded with a single model call
+    and scored against the index with a single matrix product; each caller
+    gets its own hits back. Callers pass the index they resolve the hits
+    with, so a refresh in between can't pair positions with other documents.
+    """
+    
+    def __init__(self, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._queries = 0
+        self._max_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    def search(self, query: str, index: EmbeddingIndex, top_k: int, country: Optional[str] = None,
+               vehicle_type: Optional[str] = None) -> List[Tuple[int, float]]:
+        """Blocking search of index through the batcher; returns its hits"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((time.perf_counter(), query, index, top_k, country, vehicle_type, future,
+                         current_timer()))
+        return future.result()
+    
+    def stats(self) -> Dict:
+        """Batch size and added queueing delay since startup"""
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "queries": self._queries,
+                "mean_batch_size": self._queries / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "mean_wait_ms": 1000 * self._wait_total / self._queries if self._queries else 0.0,
+                "max_wait_ms": 1000 * self._wait_max,
+            }
+    
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+    
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][0] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+    
+    def _process(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        try:
+            embeddings = encode_queries([item[1] for item in batch])
+            encoded = time.perf_counter()
+            
+            # One matrix product per index for all unfiltered queries;
+            # filtered queries only score their own partitions
+            by_index: Dict[int, List[int]] = {}
+            for i, item in enumerate(batch):
+                by_index.setdefault(id(item[2]), []).append(i)
+            results: Dict[int, List[Tuple[int, float]]] = {}
+            for positions in by_index.values():
+                index = batch[positions[0]][2]
+                plain = [i for i in positions if not (batch[i][4] or batch[i][5])]
+                if plain:
+                    k = max(batch[i][3] for i in plain)
+                    for i, hits in zip(plain, index.search_batch(embeddings[plain], k)):
+                        results[i] = hits[:batch[i][3]]
+                for i in positions:
+                    if batch[i][4] or batch[i][5]:
+                        _, _, _, top_k, country, vehicle_type, _, _ = batch[i]
+                        results[i] = index.search(embeddings[i], top_k, country, vehicle_type)
+            
+            # Every request in the batch waited for the whole batch
+            searched = time.perf_counter()
+            for i, item in enumerate(batch):
+                if item[7] is not None:
+                    item[7].add('batch_wait', started - item[0])
+                    item[7].add('query_encode', encoded - started)
+                    item[7].add('similarity', searched - encoded)
+                item[6].set_result(results[i])
+        except Exception as e:
+            for item in batch:
+                if not item[6].done():
+                    item[6].set_exception(e)
+        
+        with self._stats_lock:
+            self._batches += 1
+            self._queries += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            for item in batch:
+                wait = started - item[0]
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+
+_batcher: Optional[QueryBatcher] = None
+
+def get_batcher() -> Optional[QueryBatcher]:
+    """The shared query batcher, or None when batching is disabled"""
+    global _batcher
+    if not QUERY_BATCHING:
+        return None
+    if _batcher is None:
+        with _index_lock:
+            if _batcher is None:
+                _batcher = QueryBatcher()
+    return _batcher
+
+def prepare_documents(db_path: str = DB_PATH) -> List[Passage]:
     """
     Prepare documents from database for semantic search.
-    Returns: List of (country, vehicle_type, section, content, full_text) tuples
+    Every non-empty section becomes one or more passages (long sections are
+    split into overlapping windows).
+    Returns: List of (row_id, country, vehicle_type, section, content, passage) tuples
     """
-    conn = get_db_connection(db_path)
-    c = conn.cursor()
-    c.execute("SELECT * FROM rental_terms")
-    rows = c.fetchall()
-    conn.close()
+    rows = get_read_connection(db_path).execute(DOCUMENTS_SQL).fetchall()
     
     documents = []
-    sections = ['rental_information', 'payment_information', 'protection_conditions',
-                'authorized_driving_areas', 'extras', 'other_charges_and_taxes', 'vat']
-    
     for row in rows:
-        row_dict = dict(row)
-        country = row_dict.get('country', 'Unknown')
-        vehicle_type = row_dict.get('vehicle_type', 'Unknown')
-        
-        # Create a full text document for each row
-        full_text_parts = [f"Country: {country}", f"Vehicle Type: {vehicle_type}"]
-        
-        for section in sections:
-            content = row_dict.get(section, '')
-            if content and content.strip():
-                full_text_parts.append(f"{section.replace('_', ' ').title()}: {content}")
-        
-        full_text = " ".join(full_text_parts)
-        
-        # Add individual sections as separate documents for more granular search
-        for section in sections:
-            content = row_dict.get(section, '')
-            if content and content.strip():
-                documents.append((
-                    country,
-                    vehicle_type,
-                    section,
-                    content,
-                    full_text
-                ))
+        documents.extend(chunk_row(dict(row)))
     
     return documents
 
-def semantic_search(query: str, db_path: str = DB_PATH, top_k: int = 3) -> List[Dict]:
+def get_index(db_path: str = DB_PATH) -> EmbeddingIndex:
+    """
+    Get the embedding index for a database, loading it from disk on first use
+    and re-encoding only changed documents when the database has been modified
+    (its generation counter moved; otherwise nothing is re-read).
+
+    A returned index is never modified: a refresh builds a new one and swaps
+    it in, so callers keep one reference for the whole query and their
+    positions always match its documents.
+    """
+    path = index_path_for(db_path)
+    with timed('db_load'), _index_lock:
+        current = _indexes.get(db_path)
+        generation = db_generation(db_path)
+        if current is not None and current.generation == generation:
+            return current
+
+        if current is not None:
+            index = EmbeddingIndex(INDEX_MODEL, current.keys, current.embeddings)
+        else:
+            index = EmbeddingIndex.load(path, INDEX_MODEL, mmap=MAP_INDEX) or EmbeddingIndex(INDEX_MODEL)
+        if SHARED_INDEX:
+            with index_file_lock(path):
+                # Another worker may already have re-encoded the changes
+                on_disk = EmbeddingIndex.load(path, INDEX_MODEL, mmap=True) or EmbeddingIndex(INDEX_MODEL)
+                index.keys, index.embeddings = on_disk.keys, on_disk.embeddings
+                _refresh_index(index, db_path, path)
+                # The file now matches index.keys; swap the private copy for the shared mapping
+                if index.keys:
+                    index.embeddings = np.load(path + ".npy", mmap_mode="r")
+        else:
+            _refresh_index(index, db_path, path)
+            if MAP_INDEX and index.keys:
+                index.embeddings = np.load(path + ".npy", mmap_mode="r")
+        index.generation = generation
+        index.prepare_backend(path)
+        _indexes[db_path] = index
+        return index
+
+def _refresh_index(index: EmbeddingIndex, db_path: str, path: str) -> None:
+    """Reconcile the index with the database, saving it when passages changed"""
+    documents = prepare_documents(db_path)
+    entries = [(doc[0], doc[3], embedding_text(doc)) for doc in documents]
+    old_keys = index.keys
+    encoded = index.update(documents, entries, encode_texts)
+    if index.keys != old_keys:
+        index.save(path)
+        print(f"✅ Embedding index updated ({encoded} of {len(index)} passages encoded)")
+
+def rank_sections(index: EmbeddingIndex, hits: List[Tuple[int, float]], top_k: int) -> List[Dict]:
+    """
+    Collapse passage hits into sections: each section is scored by its best
+    passage and reported once, with the matching passage alongside the full content.
+    """
+    results = []
+    seen = set()
+    for idx, score in hits:
+        row_id, country, vehicle_type, section, content, passage = index.documents[idx]
+        if (row_id, section) in seen:
+            continue
+        seen.add((row_id, section))
+        results.append({
+            'row_id': row_id,
+            'country': country,
+            'vehicle_type': vehicle_type,
+            'section': section,
+            'content': content,
+            'passage': passage,
+            'similarity_score': score
+        })
+        if len(results) == top_k:
+            break
+    return results
+
+def semantic_search(query: str, db_path: str = DB_PATH, top_k: int = 3,
+                    country: Optional[str] = None, vehicle_type: Optional[str] = None,
+                    candidates: Optional[List[Tuple[int, str]]] = None) -> List[Dict]:
     """
     Perform semantic search on rental terms database.
     
     Args:
         query: User's question
         db_path: Path to database
-        top_k: Number of top results to return
+        top_k: Number of top sections to return
+        country: Only score passages of this country (None for all)
+        vehicle_type: Only score passages of this vehicle type (None for all)
+        candidates: Only score passages of these (row_id, section) pairs, e.g.
+            from a lexical first stage (None for all)
     
     Returns:
-        List of dictionaries with search results
+        List of dictionaries with search results, one per section
     """
     try:
-        # Get model and documents
-        model = get_model()
-        documents = prepare_documents(db_path)
+        # Get the precomputed passage index
+        index = get_index(db_path)
         
-        if not documents:
+        if len(index) == 0:
             return []
         
-        # Prepare texts for encoding
-        doc_texts = [doc[4] for doc in documents]  # Use full_text for better context
-        
-        # Encode query and documents
-        query_embedding = model.encode(query, convert_to_tensor=True)
-        doc_embeddings = model.encode(doc_texts, convert_to_tensor=True)
+        # Encode only the query; passage embeddings are already in the index.
+        # Cosine similarity is a dot product on normalised vectors. Fetch extra
+        # passages so sections split into several passages still fill top_k.
+        batcher = get_batcher()
+        if candidates is None and batcher is not None:
+            hits = batcher.search(query, index, top_k * PASSAGE_FANOUT, country, vehicle_type)
+            return rank_sections(index, hits, top_k)
         
-        # Compute similarities
-        similarities = util.pytorch_cos_sim(query_embedding, doc_embeddings)[0]
-        
-        # Get top-k results
-        top_results = torch.topk(similarities, min(top_k, len(similarities)))
-        
-        results = []
-        for score, idx in zip(top_results.values, top_results.indices):
-            country, vehicle_type, section, content, full_text = documents[idx]
-            results.append({
-                'country': country,
-                'vehicle_type': vehicle_type,
-                'section': section,
-                'content': content,
-                'full_text': full_text,
-                'similarity_score': float(score)
-            })
-        
-        return results
+        query_embedding = encode_query(query)
+        with timed('similarity'):
+            if candidates is not None:
+                hits = index.search_sections(query_embedding, top_k * PASSAGE_FANOUT, candidates)
+            else:
+                hits = index.search(query_embedding, top_k * PASSAGE_FANOUT, country, vehicle_type)
+            return rank_sections(index, hits, top_k)
         
     except Exception as e:
         print(f"Error in semantic search: {e}")
         return []
 
-def get_relevant_terms_semantic(query: str, db_path: str = DB_PATH) -> List[Dict]:
+def semantic_search_batch(query_embeddings: np.ndarray, filters: List[Tuple[Optional[str], Optional[str]]],
+                          db_path: str = DB_PATH, top_k: int = 3,
+                          candidates: Optional[List[Optional[List[Tuple[int, str]]]]] = None) -> List[List[Dict]]:
+    """
+    semantic_search for many already encoded queries. Unfiltered queries are
+    scored with one matrix product; filtered ones (filters[i] is (country,
+    vehicle_type)) only score their partitions, and queries with candidates[i]
+    only score those sections.
+    """
+    index = get_index(db_path)
+    results: List[List[Dict]] = [[] for _ in filters]
+    if len(index) == 0:
+        return results
+    k = top_k * PASSAGE_FANOUT
+    candidates = candidates or [None] * len(filters)
+    plain = [i for i, (country, vehicle_type) in enumerate(filters)
+             if not (country or vehicle_type) and candidates[i] is None]
+    if plain:
+        for i, hits in zip(plain, index.search_batch(query_embeddings[plain], k)):
+            results[i] = rank_sections(index, hits, top_k)
+    for i, (country, vehicle_type) in enumerate(filters):
+        if candidates[i] is not None:
+            results[i] = rank_sections(index, index.search_sections(query_embeddings[i], k, candidates[i]), top_k)
+        elif country or vehicle_type:
+            results[i] = rank_sections(index, index.search(query_embeddings[i], k, country, vehicle_type), top_k)
+    return results
+
+def resolve_filters(query: str, db_path: str = DB_PATH, country: Optional[str] = None,
+                    vehicle_type: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Fill in the country / vehicle_type filters not given explicitly from the question"""
+    if country is None or vehicle_type is None:
+        index = get_index(db_path)
+        detected_country, detected_vehicle = extract_filters(query, index.countries(), index.vehicle_types())
+        country = country or detected_country
+        vehicle_type = vehicle_type or detected_vehicle
+    return country, vehicle_type
+
+def get_relevant_terms_semantic(query: str, db_path: str = DB_PATH, country: Optional[str] = None,
+                                vehicle_type: Optional[str] = None, auto_filter: bool = True,
+                                top_k: int = 5) -> List[Dict]:
     """
     Get relevant rental terms using semantic search.
     Returns individual sections ranked by relevance.
+    
+    Explicit country / vehicle_type filters restrict scoring to that slice of
+    the index. With auto_filter, filters not given explicitly are detected
+    from the question (e.g. "in Germany", "for trucks").
     """
-    results = semantic_search(query, db_path, top_k=5)  # Get more results for better coverage
+    if auto_filter:
+        country, vehicle_type = resolve_filters(query, db_path, country, vehicle_type)
+    
+    results = semantic_search(query, db_path, top_k=top_k, country=country,
+                              vehicle_type=vehicle_type)  # Get more results for better coverage
     
     # Return results directly without grouping
-    return results 
\ No newline at end of file
+    return results
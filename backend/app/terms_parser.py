@@ -0,0 +1,193 @@
+"""
+Streaming section extractor for Sixt terms pages.
+
+Instead of building a full document tree and walking it, the page is fed
+through an event-based parser (start tag / end tag / text callbacks) and
+every mapped section is emitted as soon as it is complete. The standard
+library html.parser is the default. libxml2 (lxml) is faster but repairs
+malformed markup (e.g. unclosed <p> tags) differently, so it is opt-in.
+
+The output matches the original BeautifulSoup walk: every h2 starts a
+section (looked up in the section map), and the text of every h2, h3, p,
+ul and ol element after it, in document order, is one line of content.
+Nested elements contribute their text once per matching ancestor, just as
+find_all() returned both the list and the paragraphs inside it.
+
+Configuration (environment variables):
+    SIXT_HTML_PARSER  html.parser (default), lxml, or auto (lxml when installed)
+"""
+
+import os
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+try:
+    from lxml import etree
+except ImportError:  # Pure-Python fallback below
+    etree = None
+
+HTML_PARSER = os.getenv('SIXT_HTML_PARSER', 'html.parser')
+
+# Elements whose text makes up a section, and the one that starts a new section
+COLLECTED_TAGS = {'h2', 'h3', 'p', 'ul', 'ol'}
+SECTION_TAG = 'h2'
+
+# Text inside these is not page text (BeautifulSoup's get_text() skips it too)
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'param', 'source', 'track', 'wbr'}
+
+
+def parser_backend(kind: str = HTML_PARSER) -> str:
+    """Resolve `auto` to the fastest installed backend (lxml)"""
+    if kind == 'auto':
+        return 'lxml' if etree is not None else 'html.parser'
+    if kind not in ('lxml', 'html.parser'):
+        raise ValueError(f"Unknown HTML parser: {kind}")
+    if kind == 'lxml' and etree is None:
+        raise ValueError("SIXT_HTML_PARSER=lxml but lxml is not installed")
+    return kind
+
+
+class SectionExtractor:
+    """
+    Receives parser events and collects (column, text) sections. Uses the
+    callback names of lxml's parser target interface, so it can be passed
+    to lxml directly; the html.parser driver forwards to the same methods.
+    """
+
+    def __init__(self, section_map: Dict[str, str]):
+        self.section_map = section_map
+        self.sections: List[Tuple[str, str]] = []
+        self._open: List[list] = []       # element stack: [tag, slot or None]
+        self._slots: List[dict] = []      # collected elements in start order, not yet consumed
+        self._text: List[str] = []        # current run of character data
+        self._column: Optional[str] = None
+        self._content: List[str] = []
+
+    def start(self, tag, attrib=None):
+        self._flush_text()
+        tag = tag.lower()
+        if tag in VOID_TAGS:
+            return
+        slot = None
+        if tag in COLLECTED_TAGS:
+            slot = {'tag': tag, 'parts': [], 'closed': False}
+            self._slots.append(slot)
+        self._open.append([tag, slot])
+
+    def end(self, tag):
+        self._flush_text()
+        tag = tag.lower()
+        # Close the innermost open element of this name and everything inside it;
+        # stray end tags are ignored
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                for _, slot in self._open[i:]:
+                    if slot:
+                        slot['closed'] = True
+                del self._open[i:]
+                break
+        self._consume()
+
+    def data(self, data):
+        self._text.append(data)
+
+    def comment(self, text):
+        # A comment splits the surrounding text into separate strings
+        self._flush_text()
+
+    def close(self) -> List[Tuple[str, str]]:
+        self._flush_text()
+        for _, slot in self._open:
+            if slot:
+                slot['closed'] = True
+        self._open = []
+        self._consume()
+        if self._column:
+            self.sections.append((self._column, '\n'.join(self._content).strip()))
+            self._column = None
+        return self.sections
+
+    def _flush_text(self) -> None:
+        if not self._text:
+            return
+        text = ''.join(self._text).strip()
+        self._text = []
+        if not text or any(tag in NON_TEXT_TAGS for tag, _ in self._open):
+            return
+        for _, slot in self._open:
+            if slot:
+                slot['parts'].append(text)
+
+    def _consume(self) -> None:
+        """Turn closed elements into section content, in document order"""
+        while self._slots and self._slots[0]['closed']:
+            slot = self._slots.pop(0)
+            if slot['tag'] == SECTION_TAG:
+                if self._column:
+                    self.sections.append((self._column, '\n'.join(self._content).strip()))
+                self._column = self.section_map.get(''.join(slot['parts']))
+                self._content = []
+            elif self._column:
+                self._content.append(' '.join(slot['parts']))
+
+    def pop_sections(self) -> List[Tuple[str, str]]:
+        """Sections completed since the last call"""
+        sections, self.sections = self.sections, []
+        return sections
+
+
+class _StdlibDriver(HTMLParser):
+    """Feeds html.parser events into a SectionExtractor"""
+
+    def __init__(self, extractor: SectionExtractor):
+        super().__init__(convert_charrefs=True)
+        self.extractor = extractor
+
+    def handle_starttag(self, tag, attrs):
+        self.extractor.start(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.extractor.start(tag)
+        if tag.lower() not in VOID_TAGS:
+            self.extractor.end(tag)
+
+    def handle_endtag(self, tag):
+        self.extractor.end(tag)
+
+    def handle_data(self, data):
+        self.extractor.data(data)
+
+    def handle_comment(self, data):
+        self.extractor.comment(data)
+
+    def handle_decl(self, decl):
+        self.extractor.comment(decl)
+
+    def handle_pi(self, data):
+        self.extractor.comment(data)
+
+    def unknown_decl(self, data):
+        self.extractor.comment(data)
+
+
+def iter_sections(html: Union[str, Iterable[str]], section_map: Dict[str, str],
+                  backend: str = HTML_PARSER) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (column, text) for every mapped section, as soon as it is complete.
+    `html` is the page, or an iterable of decoded chunks of it.
+    """
+    chunks = [html] if isinstance(html, str) else html
+    extractor = SectionExtractor(section_map)
+    if parser_backend(backend) == 'lxml':
+        parser = etree.HTMLParser(target=extractor)
+    else:
+        parser = _StdlibDriver(extractor)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from extractor.pop_sections()
+    parser.close()
+    if parser_backend(backend) != 'lxml':
+        extractor.close()  # lxml calls the target's close() itself
+    yield from extractor.pop_sections()
@@ -0,0 +1,120 @@
+"""
+Batched writer for rental_terms rows and scraper state.
+
+Rows are buffered and written with executemany in one transaction per
+batch, instead of one INSERT and one commit (one fsync) per row. Rows are
+upserted on (country, vehicle_type), so re-scrapes update in place, and
+only rows whose sections actually changed are written.
+"""
+
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from .db import TERMS_COLUMNS, FTS_SECTIONS, configure_for_writes, ensure_generation, ensure_unique_terms
+
+DEFAULT_BATCH_SIZE = 200
+
+UPSERT_TERMS_SQL = f"""
+    INSERT INTO rental_terms ({', '.join(TERMS_COLUMNS)})
+    VALUES ({', '.join('?' * len(TERMS_COLUMNS))})
+    ON CONFLICT (country, vehicle_type) DO UPDATE SET
+        {', '.join(f'{col} = excluded.{col}' for col in FTS_SECTIONS)}
+"""
+
+UPSERT_STATE_SQL = """
+    INSERT INTO scrape_state (country, vehicle_code, vehicle_type, etag, last_modified, content_hash,
+                              checked_at, changed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (country, vehicle_code) DO UPDATE SET
+        vehicle_type = excluded.vehicle_type,
+        etag = excluded.etag,
+        last_modified = excluded.last_modified,
+        content_hash = excluded.content_hash,
+        checked_at = excluded.checked_at,
+        changed_at = CASE WHEN scrape_state.content_hash IS excluded.content_hash
+                          THEN scrape_state.changed_at ELSE excluded.changed_at END
+"""
+
+
+class TermsWriter:
+    """
+    Buffers rows and flushes them every `batch_size` rows (and on exit when
+    used as a context manager). Added / updated rows are appended to
+    `changes`; `counts` tallies added, updated and unchanged rows.
+    """
+
+    def __init__(self, conn, batch_size: int = DEFAULT_BATCH_SIZE, changes: Optional[List[Dict]] = None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.changes = changes if changes is not None else []
+        self.counts = Counter()
+        self.batches = 0
+        self._rows: Dict[tuple, Dict] = {}
+        self._states: Dict[tuple, Dict] = {}
+        configure_for_writes(conn)
+        ensure_generation(conn)  # Readers reload when the counter moves
+        ensure_unique_terms(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Keep what was buffered before a failure; nothing is half-written
+        self.flush()
+
+    def add(self, row: Dict) -> None:
+        """Queue a rental_terms row (a later row for the same key replaces it)"""
+        self._rows[(row['country'], row['vehicle_type'])] = row
+        self._maybe_flush()
+
+    def add_state(self, state: Dict) -> None:
+        """Queue a scrape_state entry (country, vehicle_code, vehicle_type, etag, last_modified, content_hash)"""
+        self._states[(state['country'], state['vehicle_code'])] = state
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._rows) + len(self._states) >= self.batch_size:
+            self.flush()
+
+    def _diff(self, row: Dict) -> Optional[Dict]:
+        """Change entry for a queued row, or None when it matches the stored row"""
+        existing = self.conn.execute(
+            f"SELECT {', '.join(FTS_SECTIONS)} FROM rental_terms WHERE country = ? AND vehicle_type = ?",
+            (row['country'], row['vehicle_type'])).fetchone()
+        if existing is None:
+            change, sections = 'added', [col for col in FTS_SECTIONS if row.get(col)]
+        else:
+            sections = [col for col, old in zip(FTS_SECTIONS, existing) if (row.get(col) or None) != (old or None)]
+            if not sections:
+                return None
+            change = 'updated'
+        return {'country': row['country'], 'vehicle_type': row['vehicle_type'],
+                'change': change, 'sections': sections}
+
+    def flush(self) -> List[Dict]:
+        """Write everything buffered in one transaction; returns this batch's changes"""
+        if not self._rows and not self._states:
+            return []
+        now = time.time()
+        with self.conn:  # commits once, or rolls the whole batch back
+            changes, rows = [], []
+            for row in self._rows.values():
+                change = self._diff(row)
+                if change is None:
+                    self.counts['unchanged'] += 1
+                    continue
+                self.counts[change['change']] += 1
+                changes.append(change)
+                rows.append([row.get(col) for col in TERMS_COLUMNS])
+            if rows:
+                self.conn.executemany(UPSERT_TERMS_SQL, rows)
+            if self._states:
+                self.conn.executemany(UPSERT_STATE_SQL, [
+                    (s['country'], s['vehicle_code'], s['vehicle_type'], s.get('etag'), s.get('last_modified'),
+                     s.get('content_hash'), now, now)
+                    for s in self._states.values()])
+        self._rows.clear()
+        self._states.clear()
+        self.batches += 1
+        self.changes.extend(changes)
+        return changes
@@ -0,0 +1,266 @@
+"""
+Vector search backends for the embedding index.
+
+`ExactBackend` scores every vector and is the right choice for small corpora.
+`IVFBackend` is an inverted-file index (spherical k-means coarse quantiser,
+pure NumPy, CPU only) that only scores the vectors in the `nprobe` clusters
+closest to the query; `nprobe` trades recall for latency.
+
+Both can scan compact copies of the vectors instead (`QuantizedVectors`:
+float16, int8 per-dimension scalar quantisation or 1 bit per dimension) and
+rescore only the best `top_k * rescore factor` candidates with the float32
+vectors. The float32 matrix is then only read for those rows, so it can stay
+memory-mapped on disk. This is a memory saving that costs latency: NumPy has
+no fast int8 / half / bit kernels, so decoding the codes makes every
+quantised scan slower than the float32 BLAS product. It only applies to
+unfiltered searches; filtered and lexical-candidate searches score the
+float32 rows directly.
+
+Configuration (environment variables):
+    SIXT_VECTOR_BACKEND    auto (default), exact or ivf
+    SIXT_IVF_NPROBE        clusters probed per query (default 8)
+    SIXT_IVF_MIN_SIZE      corpus size from which `auto` switches to IVF (default 20000)
+    SIXT_VECTOR_PRECISION  float32 (default), float16, int8 or binary (less memory, slower scans)
+    SIXT_RESCORE_FACTOR    candidates rescored per result (default 2 / 4 / 10 by precision)
+"""
+
+import os
+import tempfile
+import numpy as np
+from contextlib import contextmanager
+from typing import IO, Iterator, List, Optional, Tuple
+
+VECTOR_BACKEND = os.getenv('SIXT_VECTOR_BACKEND', 'auto')
+IVF_NPROBE = int(os.getenv('SIXT_IVF_NPROBE', '8'))
+IVF_MIN_SIZE = int(os.getenv('SIXT_IVF_MIN_SIZE', '20000'))
+VECTOR_PRECISION = os.getenv('SIXT_VECTOR_PRECISION', 'float32')
+
+# Coarser codes need more candidates to keep the true top-k among them
+RESCORE_FACTORS = {'float16': 2, 'int8': 4, 'binary': 10}
+RESCORE_FACTOR = os.getenv('SIXT_RESCORE_FACTOR')
+
+# Rows decoded at a time while scanning codes, so the float32 scratch stays small
+SCAN_CHUNK = 16384
+
+# Bits of every byte value, most significant first (np.packbits order)
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.float32)
+
+
+@contextmanager
+def atomic_file(path: str, mode: str = "wb") -> Iterator[IO]:
+    """
+    Write to a temp file with a unique name in path's directory, then move it
+    over path, so concurrent writers never share a temp file and readers
+    only ever see complete files
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files only the owner can read
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def rescore_factor(precision: str) -> int:
+    return int(RESCORE_FACTOR) if RESCORE_FACTOR else RESCORE_FACTORS.get(precision, 1)
+
+
+class QuantizedVectors:
+    """
+    Compact copy of an embedding matrix that yields approximate dot products:
+
+    - float16: half precision, 2 bytes per dimension
+    - int8: every dimension mapped linearly from its [min, max] onto 256 levels
+    - binary: the sign of every dimension, 1 bit each; queries stay float
+      (asymmetric scoring: q . sign(x) via per-byte lookup tables)
+    """
+
+    PRECISIONS = ('float16', 'int8', 'binary')
+
+    def __init__(self, embeddings: np.ndarray, precision: str):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown vector precision: {precision}")
+        self.precision = precision
+        self.dim = embeddings.shape[1]
+        if precision == 'float16':
+            self.codes = embeddings.astype(np.float16)
+            return
+        if precision == 'int8':
+            self.low = np.asarray(embeddings.min(axis=0), dtype=np.float32)
+            self.step = np.maximum(np.asarray(embeddings.max(axis=0), dtype=np.float32) - self.low, 1e-12) / 255
+            encode = lambda x: (np.rint((x - self.low) / self.step) - 128).astype(np.int8)
+        else:
+            encode = lambda x: np.packbits(x > 0, axis=1)
+        self.codes = np.concatenate([encode(embeddings[i:i + SCAN_CHUNK])
+                                     for i in range(0, len(embeddings), SCAN_CHUNK)])
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate scores of every (or the given) row against each query, shape (rows, queries)"""
+        codes = self.codes if rows is None else self.codes[rows]
+        queries = np.asarray(queries, dtype=np.float32)
+        out = np.empty((len(codes), len(queries)), dtype=np.float32)
+        if self.precision == 'float16':
+            for i in range(0, len(codes), SCAN_CHUNK):
+                out[i:i + SCAN_CHUNK] = codes[i:i + SCAN_CHUNK].astype(np.float32) @ queries.T
+        elif self.precision == 'int8':
+            # x ~ low + (code + 128) * step, so q . x = code . (q * step) + q . (low + 128 * step)
+            weights = (queries * self.step).T
+            offset = queries @ (self.low + 128 * self.step)
+            for i in range(0, len(codes), SCAN_CHUNK):
+                out[i:i + SCAN_CHUNK] = codes[i:i + SCAN_CHUNK].astype(np.float32) @ weights + offset
+        else:
+            # q . sign(x) = 2 * (q . bits) - sum(q); q . bits is summed per byte from a 256-entry table
+            padded = np.zeros((len(queries), codes.shape[1] * 8), dtype=np.float32)
+            padded[:, :self.dim] = queries
+            positions = np.arange(codes.shape[1])
+            for j, query in enumerate(padded):
+                table = query.reshape(-1, 8) @ _BYTE_BITS.T
+                for i in range(0, len(codes), SCAN_CHUNK):
+                    chunk = codes[i:i + SCAN_CHUNK]
+                    out[i:i + SCAN_CHUNK, j] = 2 * table[positions, chunk].sum(axis=1) - query.sum()
+        return out
+
+
+def rescore_top(embeddings: np.ndarray, approx: np.ndarray, query: np.ndarray, top_k: int,
+                factor: int, ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the top_k * factor rows by approximate score, then rank those by exact float32 score"""
+    first = top_k_indices(approx, top_k * factor)
+    candidates = first if ids is None else ids[first]
+    exact = np.asarray(embeddings[candidates] @ query, dtype=np.float32)
+    top = top_k_indices(exact, top_k)
+    return candidates[top], exact[top]
+
+
+class ExactBackend:
+    """Brute force cosine search over the full matrix (or its quantised copy, then rescoring)"""
+
+    name = 'exact'
+
+    def __init__(self, embeddings: np.ndarray, precision: str = 'float32'):
+        self.embeddings = embeddings
+        self.quantized = QuantizedVectors(embeddings, precision) if precision != 'float32' else None
+        self.rescore_factor = rescore_factor(precision)
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.quantized is not None:
+            return rescore_top(self.embeddings, self.quantized.scores(query[None])[:, 0], query, top_k,
+                               self.rescore_factor)
+        scores = self.embeddings @ query
+        top = top_k_indices(scores, top_k)
+        return top, scores[top]
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Score a batch of queries with one matrix product"""
+        if self.quantized is not None:
+            approx = self.quantized.scores(queries)
+            return [rescore_top(self.embeddings, approx[:, j], q, top_k, self.rescore_factor)
+                    for j, q in enumerate(queries)]
+        scores = self.embeddings @ queries.T
+        results = []
+        for j in range(scores.shape[1]):
+            top = top_k_indices(scores[:, j], top_k)
+            results.append((top, scores[top, j]))
+        return results
+
+
+class IVFBackend:
+    """Inverted file index: vectors are bucketed by their nearest centroid"""
+
+    name = 'ivf'
+
+    def __init__(self, embeddings: np.ndarray, centroids: np.ndarray, order: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = IVF_NPROBE, precision: str = 'float32'):
+        self.embeddings = embeddings
+        self.quantized = QuantizedVectors(embeddings, precision) if precision != 'float32' else None
+        self.rescore_factor = rescore_factor(precision)
+        self.centroids = centroids
+        # Vector ids grouped by cluster: cluster c owns order[offsets[c]:offsets[c + 1]]
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None, iterations: int = 10,
+              nprobe: int = IVF_NPROBE, seed: int = 0, precision: str = 'float32') -> "IVFBackend":
+        """Train centroids with spherical k-means and assign every vector to a list"""
+        n = len(embeddings)
+        nlist = max(1, min(nlist or int(4 * np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample; ~64 points per centroid is plenty for a coarse quantiser
+        sample = embeddings[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assign = np.concatenate([np.argmax(embeddings[i:i + 8192] @ centroids.T, axis=1)
+                                 for i in range(0, n, 8192)])
+        order = np.argsort(assign, kind='stable')
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        return cls(embeddings, centroids.astype(np.float32), order, offsets, nprobe, precision)
+
+    def save(self, path: str, fingerprint: str) -> None:
+        """Persist the coarse quantiser; vectors stay in the embedding index file"""
+        with atomic_file(path + ".ivf.npz", "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                     fingerprint=np.array(fingerprint))
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, fingerprint: str,
+             nprobe: int = IVF_NPROBE, precision: str = 'float32') -> Optional["IVFBackend"]:
+        """Load a saved quantiser, or None if missing or built for different vectors"""
+        try:
+            data = np.load(path + ".ivf.npz")
+        except (OSError, ValueError):
+            return None
+        if str(data['fingerprint']) != fingerprint or len(data['order']) != len(embeddings):
+            return None
+        return cls(embeddings, data['centroids'], data['order'], data['offsets'], nprobe, precision)
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        probe = top_k_indices(self.centroids @ query, self.nprobe)
+        candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+        if self.quantized is not None:
+            approx = self.quantized.scores(query[None], rows=candidates)[:, 0]
+            return rescore_top(self.embeddings, approx, query, top_k, self.rescore_factor, candidates)
+        scores = self.embeddings[candidates] @ query
+        top = top_k_indices(scores, top_k)
+        return candidates[top], scores[top]
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # Each query probes different clusters, so they are searched one by one
+        return [self.search(q, top_k) for q in queries]
+
+
+def backend_kind(n: int, kind: str = VECTOR_BACKEND) -> str:
+    """Resolve `auto` to a concrete backend for a corpus of n vectors"""
+    if kind == 'auto':
+        return 'ivf' if n >= IVF_MIN_SIZE else 'exact'
+    if kind not in ('exact', 'ivf'):
+        raise ValueError(f"Unknown vector backend: {kind}")
+    return kind
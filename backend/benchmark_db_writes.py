@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark rental_terms writes: the old one INSERT + one commit per row
+against TermsWriter (executemany, one transaction per batch, WAL).
+
+Usage (from the backend directory):
+    python benchmark_db_writes.py --rows 2000 --batch-size 200
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db import TERMS_COLUMNS, FTS_SECTIONS, ensure_fts
+from app.terms_writer import TermsWriter
+
+def make_rows(n, version=0):
+    rows = []
+    for i in range(n):
+        row = {'country': f"Country {i // 2}", 'vehicle_type': 'Truck' if i % 2 else 'Passenger vehicle'}
+        for section in FTS_SECTIONS:
+            row[section] = (f"{section.replace('_', ' ').title()} for country {i // 2}, revision {version}. "
+                            "Drivers must hold a valid licence and a credit card in their name. " * 4)
+        rows.append(row)
+    return rows
+
+def create_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute(f"""
+        CREATE TABLE rental_terms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {', '.join(f'{col} TEXT' for col in TERMS_COLUMNS)}
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE scrape_state (
+            country TEXT, vehicle_code TEXT, vehicle_type TEXT, etag TEXT, last_modified TEXT,
+            content_hash TEXT, checked_at REAL, changed_at REAL, PRIMARY KEY (country, vehicle_code)
+        )
+    """)
+    conn.commit()
+    ensure_fts(conn)
+    return conn
+
+def legacy_write(conn, rows):
+    """The previous save_terms_row: one INSERT and one commit per row"""
+    placeholders = ','.join(['?'] * len(TERMS_COLUMNS))
+    for row in rows:
+        conn.execute(f"INSERT INTO rental_terms ({','.join(TERMS_COLUMNS)}) VALUES ({placeholders})",
+                     [row.get(col) for col in TERMS_COLUMNS])
+        conn.commit()
+
+def batched_write(conn, rows, batch_size):
+    with TermsWriter(conn, batch_size) as writer:
+        for row in rows:
+            writer.add(row)
+    return writer
+
+def timed(label, fn, n):
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    print(f"  {label:<28} {seconds:8.3f}s  {n / seconds:10.0f} rows/s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rental_terms write paths")
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"📊 Writing {args.rows} rows ({len(TERMS_COLUMNS)} columns, FTS triggers on)")
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_db(os.path.join(tmp, 'legacy.db'))
+        timed("per-row commit (before)", lambda: legacy_write(conn, rows), args.rows)
+        conn.close()
+
+        conn = create_db(os.path.join(tmp, 'batched.db'))
+        writer = timed(f"batched, {args.batch_size}/txn (after)",
+                       lambda: batched_write(conn, rows, args.batch_size), args.rows)
+        assert writer.counts['added'] == args.rows
+        writer = timed("re-write, unchanged", lambda: batched_write(conn, rows, args.batch_size), args.rows)
+        assert writer.counts['unchanged'] == args.rows and not writer.changes
+        writer = timed("upsert, all changed",
+                       lambda: batched_write(conn, make_rows(args.rows, 1), args.batch_size), args.rows)
+        assert writer.counts['updated'] == args.rows
+        count = conn.execute("SELECT COUNT(*) FROM rental_terms").fetchone()[0]
+        conn.close()
+    assert count == args.rows
+    print("✅ Batched writes produced one row per (country, vehicle_type)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the query encoders: SentenceTransformer on torch against the
+exported ONNX model (float32 and int8) on onnxruntime.
+
+For each encoder: import time of its stack (in a fresh process), model load
+time, single-query latency (one question per call, as on the request
+path) and batched throughput (texts/s when encoding passages). Cosine
+similarity with the torch embeddings is reported alongside.
+
+Export the ONNX model first (see app/onnx_encoder.py), then from the backend directory:
+    python benchmark_encoders.py --model-dir models/all-MiniLM-L6-v2-onnx --batch-size 64
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.onnx_encoder import ONNX_MODEL_DIR, VALIDATION_TEXTS, OnnxEncoder
+
+QUESTIONS = [
+    "What is the minimum age to rent a car in the USA?",
+    "Can I drive the rental car to Canada?",
+    "How much is the deposit for a truck in Germany?",
+    "Which payment methods are accepted?",
+    "Is there a young driver fee?",
+    "What does the collision damage waiver cover?",
+    "Can I add a second driver?",
+    "What is the VAT rate in France?",
+]
+
+# Stack each encoder imports, timed in a fresh interpreter
+IMPORTS = {
+    'torch': "from sentence_transformers import SentenceTransformer",
+    'onnx': "import onnxruntime, tokenizers",
+}
+
+def cold_import_seconds(statement: str) -> float:
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1]) if out.returncode == 0 else float('nan')
+
+def single_query_ms(encode, repeat: int) -> np.ndarray:
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        encode([QUESTIONS[i % len(QUESTIONS)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def batch_texts_per_second(encode, texts, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(texts)
+    return rounds * len(texts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='all-MiniLM-L6-v2', help="torch reference model (name or path)")
+    parser.add_argument('--model-dir', default=ONNX_MODEL_DIR, help="ONNX export directory")
+    parser.add_argument('--repeat', type=int, default=200, help="single-query calls per encoder")
+    parser.add_argument('--batch-size', type=int, default=64, help="texts per batched call")
+    parser.add_argument('--rounds', type=int, default=5, help="batched calls per encoder")
+    parser.add_argument('--threads', type=int, default=0, help="onnxruntime intra-op threads (0: default)")
+    args = parser.parse_args()
+
+    passages = [(t + " ") * (1 + i % 4) for i, t in enumerate(VALIDATION_TEXTS * (args.batch_size // 8 + 1))]
+    passages = passages[:args.batch_size]
+
+    encoders = {}
+    from sentence_transformers import SentenceTransformer
+    start = time.perf_counter()
+    model = SentenceTransformer(args.model, device='cpu')
+    encoders['torch'] = (lambda texts: model.encode(texts, batch_size=64, convert_to_numpy=True,
+                                                    normalize_embeddings=True), time.perf_counter() - start)
+    for int8 in (False, True):
+        if int8 and not os.path.exists(os.path.join(args.model_dir, 'model_int8.onnx')):
+            continue
+        start = time.perf_counter()
+        onnx = OnnxEncoder(args.model_dir, int8=int8, threads=args.threads)
+        encoders['onnx int8' if int8 else 'onnx'] = (onnx.encode, time.perf_counter() - start)
+
+    reference = encoders['torch'][0](passages)
+    print(f"{'encoder':<10} {'import s':>8} {'load s':>7} {'1q p50 ms':>9} {'1q p95 ms':>9} "
+          f"{'batch/s':>8} {'min cos':>8}")
+    for name, (encode, load) in encoders.items():
+        encode(QUESTIONS)  # warm up
+        latencies = single_query_ms(encode, args.repeat)
+        throughput = batch_texts_per_second(encode, passages, args.rounds)
+        cosine = np.sum(np.asarray(encode(passages)) * reference, axis=1).min()
+        print(f"{name:<10} {cold_import_seconds(IMPORTS[name.split()[0]]):>8.2f} {load:>7.2f} "
+              f"{np.percentile(latencies, 50):>9.2f} {np.percentile(latencies, 95):>9.2f} "
+              f"{throughput:>8.0f} {cosine:>8.5f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark terms page parsing: the original BeautifulSoup tree walk against
+the streaming section extractor (lxml and html.parser backends), over the
+saved pages in fixtures/terms/ plus a synthetic large page. Every page must
+produce exactly the same row with the html.parser backend (the default);
+exits with status 1 otherwise. The opt-in lxml backend may repair a few
+malformed edge cases differently; those are reported as warnings.
+
+Usage (from the backend directory):
+    python benchmark_html_parsing.py --repeat 20 --sections 400
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.scraper import SECTION_MAP
+from app.terms_parser import etree, iter_sections
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "terms")
+
+def reference_parse(html):
+    """The original parse_terms_page: full BeautifulSoup tree, then find_all()"""
+    soup = BeautifulSoup(html, 'html.parser')
+    row = {}
+    current_col = None
+    content_acc = []
+    for el in soup.find_all(['h2', 'h3', 'p', 'ul', 'ol']):
+        if getattr(el, 'name', None) == 'h2':
+            section_title = el.get_text(strip=True)
+            if current_col:
+                row[current_col] = '\n'.join(content_acc).strip()
+            current_col = SECTION_MAP.get(section_title)
+            content_acc = []
+        elif current_col:
+            content_acc.append(el.get_text(" ", strip=True))
+    if current_col:
+        row[current_col] = '\n'.join(content_acc).strip()
+    return row
+
+def streaming_parse(backend):
+    def parse(html):
+        return dict(iter_sections(html, SECTION_MAP, backend))
+    return parse
+
+def synthetic_page(sections):
+    """A large terms page: every mapped section repeated, with lists, tables and entities"""
+    titles = list(SECTION_MAP) + ['Unmapped section']
+    parts = ["<!DOCTYPE html><html><head><title>Terms</title>"
+             "<script>var avail_ctype = {'US': ['EPP']};</script></head><body><h1>Rental terms</h1>"]
+    for i in range(sections):
+        parts.append(f"<h2>{titles[i % len(titles)]}</h2>")
+        parts.append(f"<p>Clause {i}: the renter &amp; every additional driver must be at least "
+                     f"21&nbsp;years old. <b>Fees</b> apply <!-- note --> per day.</p>")
+        parts.append("<h3>Details</h3><ul>" + "".join(
+            f"<li>Item {j} of clause {i}: <a href='#'>see terms</a> for limits of $2,500.</li>"
+            for j in range(5)) + "</ul>")
+        parts.append("<table><tr><td>Deposit</td><td>$200</td></tr></table>")
+        parts.append("<ol><li><p>Nested paragraph inside a list</p></li></ol>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+EDGE_CASES = {
+    'unclosed paragraphs': "<h2>VAT</h2><p>First<p>Second<ul><li>One</ul><h2>Extras</h2><p>GPS",
+    'stray end tags': "<h2>Extras</h2></p><p>GPS</div> Navigation</p></ul><h3>More</h3>",
+    'duplicate section': "<h2>VAT</h2><p>Old</p><h2>VAT</h2><p>New</p>",
+    'comments and script': "<h2>VAT</h2><p>19%<!-- c -->VAT<script>x = 1</script> applies</p>",
+    'whitespace title': "<h2>\n  VAT \n</h2><p>  spaced   text </p>",
+}
+
+# Malformed markup that libxml2 repairs differently from html.parser's literal nesting
+LXML_REPAIRS = {'unclosed paragraphs'}
+
+def time_parser(parse, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html)
+    return (time.perf_counter() - started) / repeat
+
+def peak_memory(parse, html):
+    tracemalloc.start()
+    parse(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark terms page parsers")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sections', type=int, default=400, help="sections in the synthetic large page")
+    args = parser.parse_args()
+
+    corpus = {os.path.basename(p): open(p, encoding='utf-8').read()
+              for p in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))}
+    corpus['synthetic_large.html'] = synthetic_page(args.sections)
+
+    parsers = {'beautifulsoup (before)': reference_parse,
+               'stream html.parser': streaming_parse('html.parser')}
+    if etree is not None:
+        parsers['stream lxml'] = streaming_parse('lxml')
+
+    # Identical output on every saved page and edge case
+    mismatches = 0
+    for name, html in list(corpus.items()) + list(EDGE_CASES.items()):
+        expected = reference_parse(html)
+        for label, parse in parsers.items():
+            got = parse(html)
+            if got == expected:
+                continue
+            if label == 'stream lxml' and name in LXML_REPAIRS:
+                # libxml2 repairs malformed markup (e.g. closes a <p> at the next block)
+                print(f"⚠️ {label} repairs {name}: {got}")
+                continue
+            mismatches += 1
+            print(f"❌ {label} differs on {name}:\n   expected {expected}\n   got      {got}")
+    if not mismatches:
+        print(f"✅ Rows match the BeautifulSoup walk on {len(corpus)} pages and {len(EDGE_CASES)} edge cases")
+    else:
+        print(f"❌ {mismatches} mismatch(es)")
+    print(f"📊 Parsing {len(corpus)} pages ({sum(len(h) for h in corpus.values()) / 1024:.0f} KiB), "
+          f"mean of {args.repeat} runs")
+
+    large = corpus['synthetic_large.html']
+    for label, parse in parsers.items():
+        seconds = time_parser(parse, list(corpus.values()), args.repeat)
+        print(f"  {label:<24} {seconds * 1000:8.1f} ms/corpus  "
+              f"peak {peak_memory(parse, large) / 1024 / 1024:6.1f} MiB on the large page")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
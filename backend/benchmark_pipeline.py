@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark of the retrieval path and of POST /ask.
+
+For every corpus size a synthetic rental_terms database with that many
+passages is generated (fixed seed), and a fresh process measures:
+
+- index build time (encoding every passage, plus the IVF backend on large corpora)
+- retrieval (qa.retrieve): p50/p95/p99 latency one query at a time, and
+  queries/sec with --concurrency parallel callers
+- /ask through the ASGI app with the fake LLM provider: the same latencies
+  and queries/sec with --concurrency requests in flight
+- peak memory (max RSS) of the process
+
+The answer cache is disabled so every question runs the whole pipeline.
+Results are written as JSON with the git commit; pass an earlier file to
+--compare to print the change of every number.
+
+Usage (from the backend directory):
+    python benchmark_pipeline.py --sizes 1 1000 10000 100000 --output bench.json
+    python benchmark_pipeline.py --encoder hash --compare bench.json   # offline, no model download
+
+--encoder hash replaces the sentence transformer with a hashed bag of words,
+so only the cost around the model is measured.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+# /ask always answers with the fake LLM, and the answer cache would turn
+# repeated questions into lookups; both must be set before the app is imported
+os.environ['SIXT_LLM_PROVIDER'] = 'fake'
+os.environ['SIXT_ANSWER_CACHE'] = '0'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db import TERMS_COLUMNS, FTS_SECTIONS
+
+SEED = 42
+VEHICLE_TYPES = ['Passenger vehicle', 'Truck', 'Van', 'Motorhome']
+_SYLLABLES = ['ka', 'lo', 'ri', 'ta', 'ne', 'vo', 'su', 'mi', 'da', 'po', 'le', 'ga',
+              'ba', 'ze', 'ni', 'ro', 'fe', 'tu', 'sa', 'ki']
+_TEMPLATES = {
+    'rental_information': ["Drivers must be at least {age} years old and hold a licence for {years} years.",
+                           "A young driver fee of {money} per day applies under {age}.",
+                           "Rentals start at the {place} counter between {hour}:00 and 22:00."],
+    'payment_information': ["A deposit of {money} is blocked on the credit card at pick-up.",
+                            "Accepted payment methods are {card} and debit cards with PIN.",
+                            "Prepaid rates are charged {days} days before the rental starts."],
+    'protection_conditions': ["The collision damage waiver has a deductible of {money}.",
+                              "Theft protection covers the vehicle except for {item}.",
+                              "Damage caused by driving on {road} is not covered."],
+    'authorized_driving_areas': ["The vehicle may be driven to {region} with prior notice.",
+                                 "Cross-border trips carry a fee of {money} per rental.",
+                                 "Ferries to {region} are allowed for {vehicle} rentals only."],
+    'extras': ["A {item} can be added for {money} per day.",
+               "Additional drivers cost {money} per rental and must be {age} or older.",
+               "Snow chains are available from {place} stations on request."],
+    'other_charges_and_taxes': ["A {place} surcharge of {percent}% is added to the rental.",
+                                "Returning the vehicle {days} hours late costs {money}.",
+                                "Refuelling is charged at {money} per litre plus service."],
+    'vat': ["VAT of {percent}% is included in all prices.",
+            "Services outside the rental are taxed at {percent}%."],
+}
+_WORDS = {
+    'place': ['airport', 'railway station', 'downtown', 'harbour', 'hotel'],
+    'card': ['Visa', 'Mastercard', 'American Express', 'Diners Club'],
+    'item': ['GPS navigation', 'child seat', 'roof box', 'Wi-Fi hotspot', 'tyres and glass'],
+    'road': ['unpaved roads', 'beaches', 'race tracks', 'mountain passes'],
+    'region': ['neighbouring countries', 'the islands', 'the EU', 'non-EU countries'],
+    'vehicle': ['economy', 'premium', 'electric', 'luxury'],
+}
+QUESTIONS = ["What is the minimum age to rent a car{where}?",
+             "How much is the deposit{where}?",
+             "Which payment methods are accepted{where}?",
+             "What deductible applies to the collision damage waiver{where}?",
+             "Can I drive the rental car to neighbouring countries{where}?",
+             "How much does a child seat cost{where}?",
+             "Is there an airport surcharge{where}?",
+             "What is the VAT rate{where}?"]
+
+
+def country_name(i: int) -> str:
+    s = _SYLLABLES
+    return (s[i % 20] + s[i // 20 % 20] + s[i // 400 % 20]).capitalize() + ('' if i < 8000 else f" {i // 8000}")
+
+
+def section_text(section: str, rng: random.Random) -> str:
+    sentences = []
+    for template in rng.sample(_TEMPLATES[section], k=min(2, len(_TEMPLATES[section]))):
+        values = {key: rng.choice(words) for key, words in _WORDS.items()}
+        values.update(age=rng.randint(18, 25), years=rng.randint(1, 3), money=f"${rng.randint(5, 2500)}",
+                      hour=rng.randint(5, 9), days=rng.randint(1, 14), percent=rng.randint(5, 25))
+        sentences.append(template.format(**values))
+    return ' '.join(sentences)
+
+
+def synthetic_rows(passages: int, seed: int = SEED) -> List[Dict]:
+    """Rows with `passages` non-empty sections in total (every section is one passage)"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(-(-passages // len(FTS_SECTIONS))):
+        row = {'country': country_name(i // len(VEHICLE_TYPES)), 'vehicle_type': VEHICLE_TYPES[i % len(VEHICLE_TYPES)]}
+        for n, section in enumerate(FTS_SECTIONS):
+            row[section] = section_text(section, rng) if i * len(FTS_SECTIONS) + n < passages else ''
+        rows.append(row)
+    return rows
+
+
+def synthetic_questions(rows: List[Dict], count: int, seed: int = SEED) -> List[str]:
+    """Half of the questions name a country of the corpus, the other half search everything"""
+    rng = random.Random(seed + 1)
+    questions = []
+    for i in range(count):
+        where = f" in {rng.choice(rows)['country']}" if i % 2 else ''
+        questions.append(rng.choice(QUESTIONS).format(where=where))
+    return questions
+
+
+def hash_encode(texts: List[str], dim: int = 384) -> np.ndarray:
+    """Hashed bag of words: a deterministic stand-in for the sentence transformer"""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in re.findall(r'\w+', text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), 'little')
+            vectors[i, h % dim] += 1.0 if h & (1 << 31) else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def latency_stats(latencies: List[float], seconds: float) -> Dict:
+    ms = np.array(latencies) * 1000
+    return {'queries': len(latencies), 'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)), 'p99_ms': float(np.percentile(ms, 99)),
+            'mean_ms': float(ms.mean()), 'qps': len(latencies) / seconds if seconds else 0.0}
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def bench_retrieval(questions: List[str], db_path: str, concurrency: int) -> Dict:
+    from app.qa import retrieve
+    latencies = []
+    started = time.perf_counter()
+    for question in questions:
+        t = time.perf_counter()
+        retrieve(question, db_path)
+        latencies.append(time.perf_counter() - t)
+    stats = latency_stats(latencies, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda q: retrieve(q, db_path), questions))
+    stats['concurrent_qps'] = len(questions) / (time.perf_counter() - started)
+    return stats
+
+
+async def bench_ask(questions: List[str], concurrency: int) -> Dict:
+    import httpx
+    from app.main import app
+
+    async def ask(client, question, latencies):
+        t = time.perf_counter()
+        response = await client.post('/ask', json={'question': question})
+        body = response.json()
+        if response.status_code != 200 or not body.get('success'):
+            raise RuntimeError(f"/ask failed with {response.status_code}: {body}")
+        latencies.append(time.perf_counter() - t)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        latencies: List[float] = []
+        started = time.perf_counter()
+        for question in questions:
+            await ask(client, question, latencies)
+        stats = latency_stats(latencies, time.perf_counter() - started)
+
+        # Stay under SIXT_MAX_PENDING_REQUESTS so no request is turned away with 429
+        slots = asyncio.Semaphore(concurrency)
+        concurrent: List[float] = []
+
+        async def limited(question):
+            async with slots:
+                await ask(client, question, concurrent)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(q) for q in questions))
+        seconds = time.perf_counter() - started
+        stats['concurrent_qps'] = len(questions) / seconds
+        stats['concurrent_p95_ms'] = float(np.percentile(np.array(concurrent) * 1000, 95))
+    return stats
+
+
+def run_size(passages: int, args) -> Dict:
+    """Benchmark one corpus size; runs in its own process (see main)"""
+    from app.db import DB_PATH, prepare_database
+    from app.scraper import init_db
+    from app.terms_writer import TermsWriter
+    from app.qa import retrieve
+    from app import semantic_search
+
+    if args.encoder == 'hash':
+        semantic_search.encode_texts_locally = hash_encode
+
+    rows = synthetic_rows(passages)
+    started = time.perf_counter()
+    conn = init_db(DB_PATH)
+    with TermsWriter(conn, batch_size=1000) as writer:
+        for row in rows:
+            writer.add({column: row[column] for column in TERMS_COLUMNS})
+    conn.close()
+    prepare_database(DB_PATH)
+    result = {'passages': passages, 'rows': len(rows), 'db_write_s': time.perf_counter() - started}
+
+    started = time.perf_counter()
+    index = semantic_search.get_index(DB_PATH)
+    result['index_build_s'] = time.perf_counter() - started
+    result['indexed_passages'] = len(index)
+    result['index_mib'] = index.embeddings.nbytes / 1024 / 1024 if index.embeddings is not None else 0.0
+    result['rss_after_build_mib'] = peak_rss_mib()
+
+    questions = synthetic_questions(rows, args.queries)
+    for question in questions[:args.warmup]:  # model, thread pools, first-query caches
+        retrieve(question, DB_PATH)
+    result['retrieval'] = bench_retrieval(questions, DB_PATH, args.concurrency)
+    if not args.skip_ask:
+        result['ask'] = asyncio.run(bench_ask(questions, args.concurrency))
+    result['peak_rss_mib'] = peak_rss_mib()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+# Sizes rather than measurements, left out of --compare
+COUNT_FIELDS = ('passages', 'rows', 'indexed_passages', 'retrieval.queries', 'ask.queries')
+
+
+def flatten(result: Dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(previous_path: str, report: Dict) -> None:
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    before = {r['passages']: flatten(r) for r in previous['results']}
+    print(f"\n📊 Change against {previous_path} (commit {previous.get('commit') or '?'})")
+    for result in report['results']:
+        old = before.get(result['passages'])
+        if old is None:
+            continue
+        print(f"  {result['passages']} passages")
+        for key, value in flatten(result).items():
+            if key in old and old[key] and key not in COUNT_FIELDS:
+                print(f"    {key:<28} {old[key]:>10.2f} -> {value:>10.2f}  ({(value / old[key] - 1) * 100:+.1f}%)")
+
+
+def print_result(r: Dict) -> None:
+    print(f"  {r['passages']} passages: index built in {r['index_build_s']:.2f}s "
+          f"({r['index_mib']:.1f} MiB), peak RSS {r['peak_rss_mib']:.0f} MiB")
+    for name in ('retrieval', 'ask'):
+        if name in r:
+            s = r[name]
+            print(f"    {name:<9} p50 {s['p50_ms']:7.2f} ms  p95 {s['p95_ms']:7.2f} ms  p99 {s['p99_ms']:7.2f} ms  "
+                  f"{s['qps']:7.1f} q/s  ({s['concurrent_qps']:.1f} q/s concurrent)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 10000, 100000],
+                        help="corpus sizes in passages")
+    parser.add_argument('--queries', type=int, default=200, help="questions per measurement")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=8, help="parallel callers for the qps runs")
+    parser.add_argument('--encoder', choices=['model', 'hash'], default='model')
+    parser.add_argument('--llm-latency-ms', type=float, default=50, help="fake LLM time to first token")
+    parser.add_argument('--llm-tokens-per-second', type=float, default=1000, help="fake LLM generation speed")
+    parser.add_argument('--skip-ask', action='store_true', help="only benchmark retrieval")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_size(args.child, args)))
+        return
+
+    report = {'commit': git_commit(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+              'python': platform.python_version(), 'machine': platform.machine(),
+              'cpus': os.cpu_count(), 'config': {k: v for k, v in vars(args).items() if k != 'child'},
+              'results': []}
+    print(f"🏁 Benchmarking {len(args.sizes)} corpus sizes ({args.encoder} encoder, commit {report['commit'] or '?'})")
+    workdir = tempfile.mkdtemp(prefix='sixt-bench-')
+    try:
+        for passages in args.sizes:
+            env = dict(os.environ, SIXT_DB_PATH=os.path.join(workdir, f"terms_{passages}.db"),
+                       SIXT_FAKE_LLM_LATENCY_MS=str(args.llm_latency_ms),
+                       SIXT_FAKE_LLM_TOKENS_PER_SECOND=str(args.llm_tokens_per_second))
+            # A fresh process per size, so memory peaks and caches don't carry over
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(passages)]
+                                   + sys.argv[1:], env=env, capture_output=True, text=True)
+            if child.returncode != 0:
+                print(f"❌ {passages} passages failed:\n{child.stderr[-2000:]}")
+                continue
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            report['results'].append(result)
+            print_result(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
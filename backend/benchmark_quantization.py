@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Memory saved versus recall lost for the quantised vector precisions.
+
+For every precision the compact vectors are scanned, and the best
+top_k * factor candidates are rescored in float32. Recall@k is measured
+against exact float32 search, both without rescoring (factor 1: the
+quantisation alone) and with every --factors value.
+
+Uses synthetic clustered vectors by default. Pass --index to use a real
+embedding index instead (e.g. sixt_terms.index.npy); its queries are then
+perturbed copies of indexed passages.
+
+    python benchmark_quantization.py --sizes 10000 100000 --factors 2 4 10
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.vector_backends import ExactBackend, QuantizedVectors
+from benchmark_vector_search import synthetic_vectors
+
+def run_queries(backend, queries: np.ndarray, top_k: int):
+    """Every query once; returns (ids per query, p50 latency in ms)"""
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        ids, _ = backend.search(q, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+    return results, float(np.percentile(latencies, 50))
+
+def recall(truth, found) -> float:
+    return float(np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)]))
+
+def real_index(path: str, queries: int, rng: np.random.Generator):
+    vectors = np.load(path).astype(np.float32)
+    picked = vectors[rng.choice(len(vectors), size=queries)]
+    picked = picked + 0.05 * rng.standard_normal(picked.shape).astype(np.float32)
+    return vectors, picked / np.linalg.norm(picked, axis=1, keepdims=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--factors', type=int, nargs='+', default=[2, 4, 10])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=20, help="passages fetched per search (5 sections x 4)")
+    parser.add_argument('--index', help="use the vectors of this .index.npy file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    datasets = []
+    if args.index:
+        datasets.append(real_index(args.index, args.queries, rng))
+    else:
+        for n in args.sizes:
+            data = synthetic_vectors(n + args.queries, clusters=max(8, n // 500), rng=rng)
+            datasets.append((data[:n], data[n:]))
+
+    print(f"{'passages':>9} {'precision':>9} {'MiB':>7} {'saved':>6} {'factor':>6} "
+          f"{'recall@k':>9} {'p50 ms':>7} {'build s':>8}")
+    for vectors, queries in datasets:
+        n = len(vectors)
+        exact = ExactBackend(vectors)
+        truth, p50 = run_queries(exact, queries, args.top_k)
+        full_mib = vectors.nbytes / 1024 / 1024
+        print(f"{n:>9} {'float32':>9} {full_mib:>7.1f} {'-':>6} {'-':>6} {1.0:>9.3f} {p50:>7.2f} {'-':>8}")
+        for precision in QuantizedVectors.PRECISIONS:
+            start = time.perf_counter()
+            backend = ExactBackend(vectors, precision)
+            build = time.perf_counter() - start
+            mib = backend.quantized.nbytes / 1024 / 1024
+            for factor in [1] + args.factors:
+                backend.rescore_factor = factor
+                found, p50 = run_queries(backend, queries, args.top_k)
+                print(f"{n:>9} {precision:>9} {mib:>7.1f} {(1 - mib / full_mib) * 100:>5.0f}% {factor:>6} "
+                      f"{recall(truth, found):>9.3f} {p50:>7.2f} {build:>8.2f}")
+
+if __name__ == "__main__":
+    main()
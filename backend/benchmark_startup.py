@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Cold start of the two entry points, and where the import time goes.
+
+  imports    `python -X importtime` of app.main and of streamlit_app's
+             modules, summed per top-level package (self time), so a heavy
+             dependency creeping into the import path shows up by name
+  api        `uvicorn app.main:app` in a fresh process: seconds until
+             /health answers (port open), until /ready answers (index
+             loaded, encoder warm) and the first /ask after that
+  streamlit  `streamlit run streamlit_app.py` in a fresh process: seconds
+             until /_stcore/health answers, then the script's first run
+             (page drawn and backend loaded) and a rerun, via AppTest
+
+Every measurement is repeated --runs times and the median is reported. With
+--api-target / --streamlit-target (seconds until the server answers) the
+script exits with status 1 when a target is missed, e.g. in CI.
+
+The servers use the current environment (SIXT_DB_PATH, SIXT_ENCODER, ...);
+/ask runs with SIXT_LLM_PROVIDER=fake. From the backend directory:
+    python benchmark_startup.py --runs 3 --api-target 2 --streamlit-target 3
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BACKEND_DIR)
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# What each entry point imports before it can serve (streamlit_app defers the Q&A stack)
+ENTRY_IMPORTS = {
+    'api': (BACKEND_DIR, "import app.main"),
+    'streamlit': (PROJECT_DIR, "import streamlit, backend.app.db, backend.app.llm_providers"),
+    'streamlit (backend)': (PROJECT_DIR, "import backend.app.qa"),
+}
+
+QUESTION = "What is the minimum age to rent a car?"
+
+
+def import_breakdown(cwd: str, statement: str) -> Tuple[float, Dict[str, float]]:
+    """Total import seconds and self seconds per top-level package"""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=cwd,
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    packages, total = defaultdict(float), 0.0
+    for line in out.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        packages[module.split('.')[0]] += int(self_us) / 1e6
+        if len(indent) == 1:  # Imported by the statement itself
+            total += int(cumulative_us) / 1e6
+    return total, dict(packages)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, started: float, timeout: float, process: subprocess.Popen) -> float:
+    """Seconds since started until url answers 200"""
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def post_seconds(url: str, payload: dict) -> float:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def api_cold_start(timeout: float) -> Dict[str, float]:
+    port = free_port()
+    env = dict(os.environ, SIXT_LLM_PROVIDER='fake', SIXT_ANSWER_CACHE='0')
+    env.setdefault('SIXT_FAKE_LLM_TOKENS_PER_SECOND', '1000')  # Time the pipeline, not the fake generation
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port),
+                                '--log-level', 'warning'], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        result = {'health': wait_for(f"{base}/health", started, timeout, process),
+                  'ready': wait_for(f"{base}/ready", started, timeout, process)}
+        result['first ask'] = post_seconds(f"{base}/ask", {'question': QUESTION})
+        return result
+    finally:
+        stop(process)
+
+
+# Runs in a fresh interpreter: first run of the script (cold), then a rerun
+APPTEST = """
+import json, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('streamlit_app.py', default_timeout=%(timeout)s)
+started = time.perf_counter(); app.run(); first = time.perf_counter() - started
+assert not app.exception, app.exception
+started = time.perf_counter(); app.run(); rerun = time.perf_counter() - started
+print(json.dumps({'first run': first, 'rerun': rerun}))
+"""
+
+
+def streamlit_cold_start(timeout: float) -> Dict[str, float]:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', 'streamlit_app.py',
+                                '--server.headless', 'true', '--server.port', str(port),
+                                '--browser.gatherUsageStats', 'false'], cwd=PROJECT_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        result = {'health': wait_for(f"http://127.0.0.1:{port}/_stcore/health", started, timeout, process)}
+    finally:
+        stop(process)
+    out = subprocess.run([sys.executable, '-c', APPTEST % {'timeout': timeout}], cwd=PROJECT_DIR,
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    result.update(json.loads(out.stdout.strip().splitlines()[-1]))
+    return result
+
+
+def median_of(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+
+
+def check(name: str, seconds: float, target: Optional[float]) -> bool:
+    if target is None:
+        return True
+    ok = seconds <= target
+    print(f"{'✅' if ok else '❌'} {name} answered in {seconds:.2f}s (target {target:.2f}s)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help="cold starts per entry point")
+    parser.add_argument('--top', type=int, default=10, help="packages listed per import breakdown")
+    parser.add_argument('--skip', nargs='*', default=[], choices=['imports', 'api', 'streamlit'])
+    parser.add_argument('--timeout', type=float, default=300.0, help="seconds to wait for a server")
+    parser.add_argument('--api-target', type=float, help="max seconds until /health answers")
+    parser.add_argument('--streamlit-target', type=float, help="max seconds until /_stcore/health answers")
+    args = parser.parse_args()
+
+    if 'imports' not in args.skip:
+        for name, (cwd, statement) in ENTRY_IMPORTS.items():
+            runs = [import_breakdown(cwd, statement) for _ in range(args.runs)]
+            total = float(np.median([t for t, _ in runs]))
+            packages = median_of([p for _, p in runs]) if len({len(p) for _, p in runs}) == 1 else runs[0][1]
+            print(f"\n📦 {name}: `{statement}` {total:.3f}s")
+            for package, seconds in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+                print(f"   {package:<24} {seconds * 1000:>8.1f} ms")
+
+    ok = True
+    for name, measure, target in (('api', api_cold_start, args.api_target),
+                                  ('streamlit', streamlit_cold_start, args.streamlit_target)):
+        if name in args.skip:
+            continue
+        result = median_of([measure(args.timeout) for _ in range(args.runs)])
+        print(f"\n🚀 {name} cold start (median of {args.runs}): " +
+              ", ".join(f"{key} {seconds:.2f}s" for key, seconds in result.items()))
+        ok = check(name, result['health'], target) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the exact and IVF vector search backends against each other.
+
+Uses synthetic clustered unit vectors with the all-MiniLM-L6-v2 dimension, so
+no model download or database is needed. Recall is measured against the exact
+backend's top-k.
+
+    python benchmark_vector_search.py --sizes 1000 10000 50000 --nprobe 1 4 8 16 32
+"""
+
+import argparse
+import sys
+import os
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.vector_backends import ExactBackend, IVFBackend
+
+DIM = 384
+
+def synthetic_vectors(n: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors scattered around random topic centres, like passages from many countries"""
+    centres = rng.standard_normal((clusters, DIM)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, size=n)] + 0.6 * rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def time_queries(backend, queries: np.ndarray, top_k: int):
+    """Run every query once; returns (results, per-query latencies in ms)"""
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        ids, _ = backend.search(q, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+    return results, np.array(latencies)
+
+def recall(truth, found) -> float:
+    return float(np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'passages':>9} {'backend':>12} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for n in args.sizes:
+        data = synthetic_vectors(n + args.queries, clusters=max(8, n // 500), rng=rng)
+        vectors, queries = data[:n], data[n:]
+
+        exact = ExactBackend(vectors)
+        truth, lat = time_queries(exact, queries, args.top_k)
+        print(f"{n:>9} {'exact':>12} {1.0:>9.3f} {np.percentile(lat, 50):>8.3f} {np.percentile(lat, 95):>8.3f} {'-':>8}")
+
+        start = time.perf_counter()
+        ivf = IVFBackend.build(vectors)
+        build_time = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            found, lat = time_queries(ivf, queries, args.top_k)
+            label = f"ivf/{nprobe}"
+            print(f"{n:>9} {label:>12} {recall(truth, found):>9.3f} {np.percentile(lat, 50):>8.3f} "
+                  f"{np.percentile(lat, 95):>8.3f} {build_time:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,8 @@
 Populate the database with sample Sixt rental terms data for testing
 """
 
-import sqlite3
-from app.db import get_db_connection
+from app.db import get_db_connection, ensure_fts
+from app.terms_writer import TermsWriter
 
 def populate_sample_data():
     """Add sample rental terms data to the database"""
@@ -205,28 +205,13 @@ Traffic Violations:
     
     # Connect to database
     conn = get_db_connection('sixt_terms.db')
-    cursor = conn.cursor()
+    ensure_fts(conn)  # Triggers keep the full-text index in sync with the inserts below
     
-    # Clear existing data
-    cursor.execute("DELETE FROM rental_terms")
-    
-    # Insert sample data
-    for data in sample_data:
-        cursor.execute("""
-            INSERT INTO rental_terms (
-                country, vehicle_type, rental_information, payment_information,
-                protection_conditions, authorized_driving_areas, extras,
-                other_charges_and_taxes, vat
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data['country'], data['vehicle_type'], data['rental_information'],
-            data['payment_information'], data['protection_conditions'],
-            data['authorized_driving_areas'], data['extras'],
-            data['other_charges_and_taxes'], data['vat']
-        ))
-    
-    # Commit and close
-    conn.commit()
+    # Clear existing data and insert the samples in one transaction
+    with TermsWriter(conn) as writer:
+        conn.execute("DELETE FROM rental_terms")
+        for data in sample_data:
+            writer.add(data)
     conn.close()
     
     print(f"✅ Successfully added {len(sample_data)} sample records to database")
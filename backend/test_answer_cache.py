@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for the answer cache: semantic hits must come from the same
+retrieved context, and the in-memory embeddings must follow puts, evictions
+and reloads.
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.answer_cache import AnswerCache
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+USA = "[1] USA - Passenger vehicle - Rental Information:\nDrivers must be at least 21."
+GERMANY = "[1] Germany - Passenger vehicle - Rental Information:\nDrivers must be at least 18."
+
+def test_semantic_hit_needs_same_context():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnswerCache(os.path.join(tmp, "cache.db"))
+        cache.put("Minimum age to rent in the USA?", USA, "v1", "21 years.", unit(1, 0, 0))
+
+        # Near-identical embedding, same context: semantic hit
+        hit = cache.get("What is the minimum age to rent in the USA?", USA, "v1", unit(1, 0.01, 0))
+        assert hit == ("21 years.", 'semantic')
+        # Near-identical embedding, other country's context: miss
+        assert cache.get("Minimum age to rent in Germany?", GERMANY, "v1", unit(1, 0.01, 0)) is None
+
+def test_embeddings_follow_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        cache = AnswerCache(path, max_entries=2)
+        for i in range(3):
+            cache.put(f"question {i}", USA, "v1", f"answer {i}", unit(1, i, 0))
+        # The least recently used entry was evicted from SQLite and from the matrix
+        assert len(cache._keys) == 2
+        assert cache.get("other", USA, "v1", unit(1, 0, 0)) is None
+        assert cache.get("other", USA, "v1", unit(1, 2, 0)) == ("answer 2", 'semantic')
+
+        # Replacing an entry keeps one row for it; a reload sees the same rows
+        cache.put("question 2", USA, "v1", "answer 2b", unit(1, 2, 0))
+        assert len(cache._keys) == 2
+        assert sorted(AnswerCache(path)._keys) == sorted(cache._keys)
+
+        # A new corpus version drops everything
+        assert cache.get("question 1", USA, "v2", unit(1, 1, 0)) is None
+        assert cache._keys == []
+
+if __name__ == "__main__":
+    test_semantic_hit_needs_same_context()
+    test_embeddings_follow_writes()
+    print("✅ Answer cache tests passed")
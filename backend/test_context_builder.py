@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test script for the context builder: reranked sections must keep the
+cross-encoder's order instead of being re-sorted by their fusion scores.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.context_builder import build_context
+
+def section(row_id, section_name, content, rrf_score, rerank_score=None):
+    result = {'row_id': row_id, 'country': 'USA', 'vehicle_type': 'Passenger vehicle',
+              'section': section_name, 'content': content, 'rrf_score': rrf_score}
+    if rerank_score is not None:
+        result['rerank_score'] = rerank_score
+    return result
+
+AGE = "Drivers must be at least 21 years old to rent a car. Drivers under 25 pay a young driver fee."
+VAT = "Sales tax of 8% is added to all rental charges. Airport locations charge an extra concession fee."
+
+def test_fused_order():
+    """Without reranking, the best fused score comes first"""
+    context, _ = build_context("minimum age", [section(1, 'vat', VAT, 0.02),
+                                               section(1, 'rental_information', AGE, 0.03)])
+    assert context.index(AGE[:20]) < context.index(VAT[:20])
+
+def test_reranked_order():
+    """The reranker's top section comes first even though its fused score is lower"""
+    reranked = [section(1, 'rental_information', AGE, 0.02, rerank_score=0.9),
+                section(1, 'vat', VAT, 0.03, rerank_score=0.1)]
+    context, _ = build_context("minimum age", reranked)
+    assert context.startswith("[1] USA - Passenger vehicle - Rental Information")
+    assert context.index(AGE[:20]) < context.index(VAT[:20])
+
+    # Under a tight budget the reranker's top section is the one that stays
+    context, stats = build_context("minimum age", reranked, budget=40)
+    assert AGE[:20] in context and VAT[:20] not in context
+    assert stats['dropped'] == 1
+
+if __name__ == "__main__":
+    test_fused_order()
+    test_reranked_order()
+    print("✅ Context builder tests passed")
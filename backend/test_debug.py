@@ -6,6 +6,8 @@ Test script to debug the QA system
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Print the retrieved context and stage timings of every question
+os.environ.setdefault('SIXT_DEBUG_LOG', '1')
 
 from app.qa import answer_question
 
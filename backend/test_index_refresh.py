@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for refreshing the embedding index while it is being searched:
+a query must score and resolve its hits against one consistent index, so
+positions never point past (or at the wrong) documents of a newer one. Both
+the batch path and the micro-batcher are searched.
+"""
+
+import sys
+import os
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import semantic_search
+from app.chunking import embedding_text
+from app.db import ensure_generation
+
+DIM = 16
+
+def fake_encode(texts):
+    """Deterministic unit vectors, so a hit's score can be checked against its passage"""
+    vectors = []
+    for text in texts:
+        seed = int.from_bytes(hashlib.sha1(text.encode('utf-8')).digest()[:4], 'little')
+        vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+        vectors.append(vector / np.linalg.norm(vector))
+    return np.vstack(vectors)
+
+def create_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE rental_terms (id INTEGER PRIMARY KEY, country TEXT, vehicle_type TEXT, "
+                 + ", ".join(f"{s} TEXT" for s in semantic_search.SECTIONS) + ")")
+    ensure_generation(conn)
+    return conn
+
+def add_rows(conn, start, count):
+    for i in range(start, start + count):
+        conn.execute("INSERT INTO rental_terms (id, country, vehicle_type, rental_information, extras) "
+                     "VALUES (?, ?, 'Passenger vehicle', ?, ?)",
+                     (i, f"Country {i % 3}", f"Row {i} requires a minimum age of {18 + i % 9}.",
+                      f"Row {i} offers child seats."))
+    conn.commit()
+
+def check_hit(result, query):
+    """The reported score must be the query's similarity to the passage that was returned"""
+    doc = (result['row_id'], result['country'], result['vehicle_type'], result['section'],
+           result['content'], result['passage'])
+    expected = float(fake_encode([embedding_text(doc)])[0] @ query)
+    assert abs(result['similarity_score'] - expected) < 1e-4, (result, expected)
+
+def test_refresh_while_searching():
+    original_encode = semantic_search.encode_texts
+    semantic_search.encode_texts = fake_encode
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "terms.db")
+            conn = create_db(db_path)
+            add_rows(conn, 0, 40)
+            semantic_search.get_index(db_path)
+
+            errors = []
+            stop = threading.Event()
+            queries = fake_encode([f"question {i}" for i in range(8)])
+
+            def search():
+                try:
+                    while not stop.is_set():
+                        filters = [(None, None)] * 4 + [("Country 1", None)] * 4
+                        for results, query in zip(semantic_search.semantic_search_batch(
+                                queries, filters, db_path, top_k=5), queries):
+                            for result in results:
+                                check_hit(result, query)
+                except Exception as e:
+                    errors.append(e)
+
+            def search_batched():
+                try:
+                    while not stop.is_set():
+                        for i, query in enumerate(queries):
+                            country = "Country 2" if i % 2 else None
+                            # semantic_search swallows errors, so an empty result is a failure too
+                            results = semantic_search.semantic_search(f"question {i}", db_path, 5, country)
+                            assert results, f"no results for question {i}"
+                            for result in results:
+                                check_hit(result, query)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = ([threading.Thread(target=search) for _ in range(2)]
+                       + [threading.Thread(target=search_batched) for _ in range(2)])
+            for thread in threads:
+                thread.start()
+            try:
+                # Grow and shrink the corpus, refreshing the index each time
+                for step in range(100):
+                    if step % 2:
+                        conn.execute("DELETE FROM rental_terms WHERE id >= 40")
+                        conn.commit()
+                    else:
+                        add_rows(conn, 40, 20 + step % 7)
+                    semantic_search.get_index(db_path)
+            finally:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            conn.close()
+            assert not errors, errors[:3]
+    finally:
+        semantic_search.encode_texts = original_encode
+
+if __name__ == "__main__":
+    test_refresh_while_searching()
+    print("✅ Index refresh tests passed")
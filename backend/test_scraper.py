@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent scraper against a local fixture server.
+
+The server serves the saved pages in fixtures/terms/ the way the Sixt terms
+endpoint does (selected by the liso / rtar query parameters), and can make
+the first request for every page fail with 503 to exercise retries. Pages
+carry an ETag (unless disabled) and matching conditional requests get a 304.
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.scraper import init_db, crawl_all_terms, write_change_set
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "terms")
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlsplit(self.path).query)
+        liso, rtar = params.get('liso', [''])[0], params.get('rtar', [''])[0]
+        name = 'index.html' if rtar == '000' else f"{liso}_{rtar}.html"
+        self.server.requests[name] += 1
+
+        path = os.path.join(FIXTURES_DIR, name)
+        if not os.path.exists(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.server.fail_first and name != 'index.html' and self.server.requests[name] == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = self.server.overrides.get(name)
+        if body is None:
+            with open(path, 'rb') as f:
+                body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.server.etags and self.headers.get('If-None-Match') == etag:
+            self.server.not_modified[name] += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if self.server.etags:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(fail_first=False):
+    """Start the fixture server on a free port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.requests = Counter()
+    server.not_modified = Counter()
+    server.fail_first = fail_first
+    server.etags = True
+    server.overrides = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/php/terms/view"
+
+def test_full_crawl():
+    """Crawl every fixture country / vehicle type, retrying injected 503s"""
+    server, base_url = start_fixture_server(fail_first=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = init_db(os.path.join(tmp, 'terms.db'))
+        try:
+            stats = crawl_all_terms(conn, base_url, workers=4, rate=50.0)
+            rows = conn.execute("SELECT country, vehicle_type, rental_information, vat FROM rental_terms "
+                                "ORDER BY country, vehicle_type").fetchall()
+            states = conn.execute("SELECT country, vehicle_code, vehicle_type FROM scrape_state "
+                                  "ORDER BY country, vehicle_code").fetchall()
+        finally:
+            conn.close()
+            server.shutdown()
+
+    print(f"📊 Stats: {stats}")
+    for row in rows:
+        print(f"  - {row[0]} ({row[1]}): {row[2][:50]}")
+
+    # US passenger + US truck + Germany saved; France has no page (404, not retried).
+    # US also lists IP, a second passenger vehicle code: only EPP is fetched for that type
+    assert stats['targets'] == 4
+    assert server.requests['US_IP.html'] == 0
+    assert stats['added'] == 3
+    assert stats['failed'] == 1
+    assert [(r[0], r[1]) for r in rows] == [('Germany', 'Passenger vehicle'), ('USA', 'Passenger vehicle'),
+                                            ('USA', 'Truck')]
+    assert rows[0][3] == '19% VAT applies to all rental charges in Germany.'
+    # Validators are kept per page, i.e. per vehicle code
+    assert [tuple(s) for s in states] == [('Germany', 'EPP', 'Passenger vehicle'), ('USA', 'EPL', 'Truck'),
+                                          ('USA', 'EPP', 'Passenger vehicle')]
+    # Every existing page failed once with 503 and was fetched again
+    assert server.requests['US_EPP.html'] == 2
+    assert server.requests['FR_EPP.html'] == 1
+    print("✅ Full crawl test passed!")
+
+def test_incremental_recrawl():
+    """Re-crawls skip unchanged pages and only report real changes"""
+    server, base_url = start_fixture_server()
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = init_db(os.path.join(tmp, 'terms.db'))
+        try:
+            first = []
+            crawl_all_terms(conn, base_url, workers=4, rate=50.0, changes=first)
+
+            # Same pages, ETags sent back: every page answers 304 and nothing is parsed
+            second = []
+            stats = crawl_all_terms(conn, base_url, workers=4, rate=50.0, changes=second)
+            assert stats['not_modified'] == 3 and second == []
+
+            # No validators from the server: the body hash catches the unchanged pages
+            server.etags = False
+            third = []
+            stats = crawl_all_terms(conn, base_url, workers=4, rate=50.0, changes=third)
+            assert stats['unchanged'] == 3 and third == []
+
+            # One page changes: it is updated in place and reported with its changed section
+            with open(os.path.join(FIXTURES_DIR, 'DE_EPP.html'), 'rb') as f:
+                page = f.read()
+            server.overrides['DE_EPP.html'] = page.replace(b'19% VAT', b'20% VAT')
+            fourth = []
+            stats = crawl_all_terms(conn, base_url, workers=4, rate=50.0, changes=fourth)
+            count = conn.execute("SELECT COUNT(*) FROM rental_terms").fetchone()[0]
+            vat = conn.execute("SELECT vat FROM rental_terms WHERE country = 'Germany'").fetchone()[0]
+
+            changes_path = os.path.join(tmp, 'changes.json')
+            write_change_set(fourth, changes_path)
+            assert os.path.getsize(changes_path) > 0
+        finally:
+            conn.close()
+            server.shutdown()
+
+    print(f"📊 Changes: first {len(first)}, last {fourth}")
+    assert len(first) == 3 and all(c['change'] == 'added' for c in first)
+    assert stats['updated'] == 1 and stats['unchanged'] == 2
+    assert fourth == [{'country': 'Germany', 'vehicle_type': 'Passenger vehicle',
+                       'change': 'updated', 'sections': ['vat']}]
+    assert count == 3
+    assert vat.startswith('20% VAT')
+    print("✅ Incremental re-crawl test passed!")
+
+if __name__ == "__main__":
+    test_full_crawl()
+    test_incremental_recrawl()
@@ -39,15 +39,8 @@ def test_semantic_search():
                 print(f"  Country: {result['country']}")
                 print(f"  Vehicle Type: {result['vehicle_type']}")
                 print(f"  Similarity Score: {result.get('similarity_score', 'N/A'):.3f}")
-                
-                # Show which sections have content
-                sections_with_content = []
-                for section in ['rental_information', 'payment_information', 'protection_conditions',
-                               'authorized_driving_areas', 'extras', 'other_charges_and_taxes', 'vat']:
-                    if result.get(section, '').strip():
-                        sections_with_content.append(section.replace('_', ' ').title())
-                
-                print(f"  Relevant Sections: {', '.join(sections_with_content)}")
+                print(f"  Section: {result['section'].replace('_', ' ').title()}")
+                print(f"  Passage: {result['passage'][:100]}...")
                 print()
         else:
             print("  No results found")
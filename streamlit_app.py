@@ -1,7 +1,4 @@
 import streamlit as st
-import requests
-import json
-from typing import List, Dict
 import sys
 import os
 
@@ -10,8 +7,10 @@ import os
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
-from backend.app import qa
-from backend.app import semantic_search
+# Light modules only: the Q&A pipeline pulls in numpy and the search stack, and
+# the encoder pulls in torch, so both are loaded in get_answer_pool() after the page is drawn
+from backend.app import db
+from backend.app import llm_providers
 
 # Configuration
 # BACKEND_URL = "http://localhost:8000" # No longer needed
@@ -23,6 +22,21 @@ def init_session_state():
     if "api_key_set" not in st.session_state:
         st.session_state.api_key_set = False
 
+@st.cache_resource(show_spinner="⏳ Loading the search index...")
+def get_answer_pool():
+    """
+    Load the model, database and index once per process and start the worker
+    pool that answers the questions of every session (see app/answer_pool.py)
+    """
+    from backend.app import semantic_search
+    from backend.app.answer_pool import AnswerPool
+    from backend.app.reranker import get_reranker
+    semantic_search.load_encoder() # This will pre-load the sentence transformer (or ONNX) model
+    db.prepare_database() # Create / backfill the full-text index and generation counter if needed
+    semantic_search.get_index() # Load the precomputed document embeddings
+    get_reranker() # Load the cross-encoder when reranking is enabled (SIXT_RERANK=1)
+    return AnswerPool()
+
 def main():
     st.set_page_config(
         page_title="Sixt Rental Q&A Chatbot",
@@ -30,9 +44,8 @@ def main():
         layout="wide"
     )
     
-    # Initialize session state and load the model at startup
+    # Initialize session state (the model is loaded once the page is drawn)
     init_session_state()
-    semantic_search.get_model() # This will pre-load the sentence transformer model
     
     # Header
     st.title("🚗 Sixt Rental Q&A Chatbot")
@@ -42,9 +55,11 @@ def main():
     with st.sidebar:
         st.header("⚙️ Configuration")
         
-        # Check for Google API Key
-        api_key_set = bool(os.getenv("GOOGLE_API_KEY"))
-        if api_key_set:
+        # Check for Google API Key (only Gemini needs one)
+        api_key_set = bool(os.getenv("GOOGLE_API_KEY")) or llm_providers.LLM_PROVIDER != "gemini"
+        if llm_providers.LLM_PROVIDER != "gemini":
+            st.success(f"✅ LLM provider: {llm_providers.LLM_PROVIDER}")
+        elif api_key_set:
             st.success("✅ Google API Key is set")
         else:
             st.error("❌ Google API Key not set")
@@ -63,6 +78,11 @@ def main():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
+    # Load the model at startup, after the page is on screen (shared by all sessions)
+    pool = get_answer_pool()
+    stats = pool.stats()
+    st.sidebar.caption(f"👥 {stats['running']}/{stats['workers']} questions being answered, {stats['waiting']} waiting")
+
     # Chat input
     if prompt := st.chat_input("Ask a question about Sixt rental terms..."):
         # Add user message to chat history
@@ -78,24 +98,36 @@ def main():
                 st.error("Cannot process request: GOOGLE_API_KEY is not set.")
                 return
 
-            with st.spinner("🤖 Searching terms and thinking..."):
+            try:
+                from backend.app.answer_pool import AnswerPoolBusy
                 try:
-                    response = qa.answer_question(prompt) # Call the local function directly
-                    
-                    answer = response.get("answer", "Sorry, I couldn't find an answer.")
-                    st.markdown(answer)
-                    
-                    # Show source count
-                    if response.get("sources") and len(response["sources"]) > 0:
-                        st.info(f"📚 Based on {len(response['sources'])} relevant section(s) from the rental terms.")
-                    
-                    # Add assistant message to chat history
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
+                    job = pool.submit(prompt)
+                except AnswerPoolBusy:
+                    busy_msg = "🚦 Many people are asking right now. Please try again in a moment."
+                    st.warning(busy_msg)
+                    st.session_state.messages.append({"role": "assistant", "content": busy_msg})
+                    return
+
+                if not job.started.wait(0.1):
+                    with st.spinner("⏳ Waiting for a free slot..."):
+                        job.started.wait()
+                with st.spinner("🤖 Searching terms..."):
+                    response = job.result() # Retrieval runs on a pool worker, generation streams below
+                
+                # Render tokens as Gemini produces them
+                answer = st.write_stream(response["answer"]) or "Sorry, I couldn't find an answer."
+                
+                # Show source count
+                if response.get("sources") and len(response["sources"]) > 0:
+                    st.info(f"📚 Based on {len(response['sources'])} relevant section(s) from the rental terms.")
+                
+                # Add assistant message to chat history
+                st.session_state.messages.append({"role": "assistant", "content": answer})
 
-                except Exception as e:
-                    error_msg = f"❌ An error occurred: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+            except Exception as e:
+                error_msg = f"❌ An error occurred: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file